@@ -0,0 +1,128 @@
+"""网页正文提取性能基准
+
+对比原有的逐候选评分实现和 extractor.py 中的单次遍历实现，输出每页耗时和结果是否一致。
+
+用法：
+    python benchmarks/bench_extractor.py                 # 使用生成的样例页面
+    python benchmarks/bench_extractor.py path/to/pages   # 使用目录中的 .html 文件
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import extractor  # noqa: E402
+
+
+def legacy_extract(page: bytes) -> str:
+    """原有实现：对每个候选元素分别调用 get_text、str 和 find_all"""
+    soup = BeautifulSoup(page, extractor.HTML_PARSER)
+    for element in soup(extractor.REMOVED_TAGS):
+        element.extract()
+
+    title = None
+    for selector in extractor.TITLE_SELECTORS:
+        candidate = soup.select_one(selector)
+        if candidate and candidate.text.strip():
+            title = candidate.text.strip()
+            break
+
+    content_candidates = []
+    for selector in extractor.CONTENT_SELECTORS:
+        content_candidates.extend(soup.select(selector))
+
+    best_content = None
+    max_score = 0
+    for element in content_candidates:
+        text_length = len(element.get_text(strip=True))
+        html_length = len(str(element))
+        text_density = text_length / html_length if html_length > 0 else 0
+        score = (
+            text_length * 1.0 +
+            text_density * 100 +
+            len(element.find_all('p')) * 30 +
+            len(element.find_all('img')) * 10
+        )
+        links = element.find_all('a')
+        link_text_ratio = sum(len(a.get_text(strip=True)) for a in links) / text_length if text_length > 0 else 0
+        if link_text_ratio > 0.5:
+            score *= 0.5
+        if score > max_score:
+            max_score = score
+            best_content = element
+
+    if best_content is None:
+        return None
+    for ad in best_content.select(extractor.AD_SELECTOR):
+        ad.extract()
+    content_text = re.sub(r'\n{3,}', '\n\n', best_content.get_text(separator='\n', strip=True))
+    return (f"标题: {title}\n\n" if title else "") + content_text
+
+
+def generate_page(rng: random.Random, paragraphs: int, depth: int) -> bytes:
+    """生成带多层嵌套内容容器、导航和推荐列表的样例页面"""
+    words = ["性能", "缓存", "网络", "模型", "总结", "文章", "数据", "延迟", "吞吐", "优化", "content", "article"]
+
+    def paragraph():
+        return "<p>" + "".join(rng.choice(words) for _ in range(rng.randint(20, 80))) + "</p>"
+
+    body = "".join(paragraph() for _ in range(paragraphs))
+    body += "".join(f'<img src="/img/{i}.png">' for i in range(paragraphs // 10))
+    for level in range(depth):
+        body = f'<div class="content-level-{level} article-wrap">{body}</div>'
+    nav = "<ul>" + "".join(f'<li><a href="/p/{i}">{rng.choice(words)}</a></li>' for i in range(50)) + "</ul>"
+    recommend = '<div class="recommend-list">' + "".join(paragraph() for _ in range(5)) + "</div>"
+    html = (
+        f"<html><head><title>样例文章</title><style>p{{color:red}}</style></head><body>"
+        f"<nav>{nav}</nav><h1>样例文章标题</h1><article>{body}{recommend}</article>"
+        f'<div class="sidebar">{nav}</div><footer>footer</footer></body></html>'
+    )
+    return html.encode("utf-8")
+
+
+def load_corpus(path: str = None) -> list:
+    if path:
+        pages = []
+        for name in sorted(os.listdir(path)):
+            if name.endswith((".html", ".htm")):
+                with open(os.path.join(path, name), "rb") as f:
+                    pages.append((name, f.read()))
+        return pages
+
+    rng = random.Random(42)
+    return [
+        (f"generated-p{paragraphs}-d{depth}.html", generate_page(rng, paragraphs, depth))
+        for paragraphs, depth in [(20, 2), (100, 4), (300, 6), (1000, 8)]
+    ]
+
+
+def bench(fn, page: bytes, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn(page)
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    corpus = load_corpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"解析器: {extractor.HTML_PARSER}, 页面数: {len(corpus)}")
+    print(f"{'页面':<32}{'大小KB':>8}{'原实现ms':>12}{'新实现ms':>12}{'加速比':>8}  结果一致")
+    total_legacy = total_new = 0.0
+    for name, page in corpus:
+        rounds = 3 if len(page) > 200_000 else 10
+        legacy_ms = bench(legacy_extract, page, rounds)
+        new_ms = bench(extractor.extract_article, page, rounds)
+        total_legacy += legacy_ms
+        total_new += new_ms
+        same = legacy_extract(page) == extractor.extract_article(page)
+        print(f"{name:<32}{len(page) / 1024:>8.1f}{legacy_ms:>12.2f}{new_ms:>12.2f}{legacy_ms / new_ms:>8.2f}  {same}")
+    print(f"{'合计':<32}{'':>8}{total_legacy:>12.2f}{total_new:>12.2f}{total_legacy / total_new:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""命令路由微基准
+
+对比原有的逐触发词构造正则的判断方式和 router.py 中预编译的路由，
+在接近真实群聊的消息分布上测量每条消息的平均耗时。
+
+用法：
+    python benchmarks/bench_router.py [消息数]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from router import CommandRouter  # noqa: E402
+
+URL_PATTERN = r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[-\w./?=&]*'
+SUM_TRIGGER = "/总结"
+QA_TRIGGER = "问"
+SUMMARY_TRIGGERS = [
+    SUM_TRIGGER,
+    f"{SUM_TRIGGER}链接",
+    f"{SUM_TRIGGER}内容",
+    f"{SUM_TRIGGER}一下",
+    f"帮我{SUM_TRIGGER}",
+    "summarize"
+]
+
+
+def legacy_route(content: str):
+    """原有实现：每条消息对每个触发词构造并匹配正则，再单独提取参数和URL"""
+    lowered = content.strip().lower()
+    if re.match(f"^{re.escape(QA_TRIGGER)}\\s*.*", lowered) is not None:
+        question_match = re.match(f"^{re.escape(QA_TRIGGER)}\\s*(.*?)$", content)
+        return "qa", question_match.group(1).strip() if question_match else ""
+    for trigger in SUMMARY_TRIGGERS:
+        if re.match(f"^{re.escape(trigger)}\\s*.*", lowered):
+            url_match = re.search(f"({SUM_TRIGGER})\\s*(.*?)\\s*({URL_PATTERN})", content)
+            if url_match:
+                url = re.findall(URL_PATTERN, content)[0]
+                return "summary", url_match.group(2).strip(), url
+            return "summary", re.sub(f"^{re.escape(SUM_TRIGGER)}\\s*", "", content, 1).strip()
+    urls = re.findall(URL_PATTERN, content)
+    return ("url", urls) if urls else ("ignore",)
+
+
+def generate_messages(count: int) -> list:
+    """生成消息样本：约70%普通聊天、15%链接分享、10%总结命令、5%追问"""
+    rng = random.Random(7)
+    chats = ["哈哈哈", "收到", "今天中午吃什么", "这个问题我明天看一下", "好的👌", "有人在吗？" * 3,
+             "刚才那个会议纪要发一下吧，顺便把周报也整理一下，谢谢大家"]
+    urls = ["https://mp.weixin.qq.com/s/AbCdEfGhIjKlMnOp", "https://github.com/pigracing/AutoSummaryOpenAI",
+            "http://example.com/article?id=12345&from=timeline"]
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.70:
+            messages.append(rng.choice(chats))
+        elif roll < 0.85:
+            messages.append(f"大家看看这篇 {rng.choice(urls)} 写得不错")
+        elif roll < 0.95:
+            messages.append(rng.choice([SUM_TRIGGER, f"{SUM_TRIGGER} {rng.choice(urls)}",
+                                        f"{SUM_TRIGGER} 主要讲了什么 {rng.choice(urls)}", "summarize"]))
+        else:
+            messages.append(f"{QA_TRIGGER} 这篇文章的主要观点是什么？")
+    return messages
+
+
+def bench(fn, messages: list) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    messages = generate_messages(count)
+    router = CommandRouter(SUMMARY_TRIGGERS, QA_TRIGGER, URL_PATTERN)
+
+    # 预热，排除正则缓存首次编译的影响
+    bench(legacy_route, messages[:1000])
+    bench(router.route, messages[:1000])
+
+    legacy_us = bench(legacy_route, messages)
+    router_us = bench(router.route, messages)
+    print(f"消息数: {count}")
+    print(f"原实现: {legacy_us:.2f} μs/条")
+    print(f"预编译路由: {router_us:.2f} μs/条")
+    print(f"加速比: {legacy_us / router_us:.2f}")
+
+
+if __name__ == "__main__":
+    main()
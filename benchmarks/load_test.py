@@ -0,0 +1,347 @@
+"""端到端压测
+
+用合成的消息流（链接分享、XML卡片、总结命令、追问、普通聊天）驱动插件的
+handle_text_message、handle_article_message 和 handle_file_message，
+openai、Jina 和源站都由本地 aiohttp 桩服务代替，可以配置延迟、错误率和 429 比例。
+输出每秒处理消息数、端到端耗时的 p50/p95/p99 和峰值内存。
+
+需要在机器人的运行环境中执行（依赖 utils.plugin_base 等模块），在机器人根目录下运行：
+    python plugins/AutoSummaryOpenAI/benchmarks/load_test.py --messages 2000 --concurrency 64
+
+插件内所有域名都通过自定义 DNS 解析指向本地桩服务，不会访问外部网络；
+持久化存储默认关闭，使用 --persist 时写入临时目录。
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.getcwd())
+sys.path.insert(0, os.path.dirname(PLUGIN_DIR))
+
+from aiohttp import web  # noqa: E402
+from aiohttp.abc import AbstractResolver  # noqa: E402
+from loguru import logger  # noqa: E402
+
+plugin_package = importlib.import_module(os.path.basename(PLUGIN_DIR))
+http_pool = importlib.import_module(f"{os.path.basename(PLUGIN_DIR)}.http_pool")
+llm_pool = importlib.import_module(f"{os.path.basename(PLUGIN_DIR)}.llm_pool")
+store_module = importlib.import_module(f"{os.path.basename(PLUGIN_DIR)}.store")
+
+ORIGIN_HOST = "origin.bench.test"
+JINA_HOST = "jina.bench.test"
+LLM_HOST = "llm.bench.test"
+
+SUMMARY_TEXT = (
+    "压测样例文章标题\n\n📖 总结\n这是一段由本地桩服务生成的总结，用于测量插件的吞吐和延迟。\n\n"
+    "💡 关键要点\n1. 第一条要点。\n2. 第二条要点。\n3. 第三条要点。\n\n🏷 标签: #压测 #性能 #缓存"
+)
+
+
+class StubResolver(AbstractResolver):
+    """把压测用的域名解析到本地桩服务的端口，其他域名拒绝解析"""
+
+    def __init__(self, ports: Dict[str, int]):
+        self.ports = ports
+
+    async def resolve(self, host, port=0, family=0):
+        if host not in self.ports:
+            raise OSError(f"压测环境不允许访问外部域名: {host}")
+        return [{"hostname": host, "host": "127.0.0.1", "port": self.ports[host],
+                 "family": family or 2, "proto": 0, "flags": 0}]
+
+    async def close(self):
+        pass
+
+
+class StubBehavior:
+    """桩服务的延迟和故障注入配置"""
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, throttle_rate: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+    async def delay(self, rng: random.Random, fraction: float = 1.0):
+        await asyncio.sleep(max(0.0, (self.latency + rng.uniform(-self.jitter, self.jitter)) * fraction))
+
+    def fault(self, rng: random.Random):
+        """按配置的比例返回 429 或 500 响应，正常时返回 None"""
+        self.requests += 1
+        roll = rng.random()
+        if roll < self.throttle_rate:
+            self.throttled += 1
+            return web.Response(status=429, text="rate limited", headers={"Retry-After": "1"})
+        if roll < self.throttle_rate + self.error_rate:
+            self.errors += 1
+            return web.Response(status=500, text="internal error")
+        return None
+
+
+def article_body(article_id: int, paragraphs: int = 30) -> str:
+    rng = random.Random(article_id)
+    words = ["性能", "缓存", "网络", "模型", "总结", "文章", "数据", "延迟", "吞吐", "优化"]
+    return "\n\n".join(
+        "".join(rng.choice(words) for _ in range(rng.randint(30, 80))) for _ in range(paragraphs)
+    )
+
+
+def build_stub_apps(args, rng: random.Random):
+    """返回 ({域名: 桩服务}, {名称: 故障注入配置})"""
+    llm = StubBehavior(args.llm_latency, args.llm_latency * 0.3, args.llm_error_rate, args.llm_429_rate)
+    jina = StubBehavior(args.jina_latency, args.jina_latency * 0.3, args.jina_error_rate, args.jina_429_rate)
+    origin = StubBehavior(args.origin_latency, args.origin_latency * 0.3, 0.0, 0.0)
+
+    async def chat_completions(request: web.Request):
+        fault = llm.fault(rng)
+        payload = await request.json()
+        if fault is not None:
+            await llm.delay(rng, 0.1)
+            return fault
+        if not payload.get("stream"):
+            await llm.delay(rng)
+            return web.json_response({"choices": [{"message": {"content": SUMMARY_TEXT}}]})
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        pieces = [SUMMARY_TEXT[i:i + 16] for i in range(0, len(SUMMARY_TEXT), 16)]
+        for piece in pieces:
+            await llm.delay(rng, 1 / len(pieces))
+            chunk = {"choices": [{"delta": {"content": piece}}]}
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def jina_reader(request: web.Request):
+        fault = jina.fault(rng)
+        await jina.delay(rng)
+        if fault is not None:
+            return fault
+        article_id = int(request.match_info["tail"].rstrip("/").rsplit("/", 1)[-1] or 0)
+        return web.Response(text=f"Title: 压测文章 {article_id}\n\n{article_body(article_id)}")
+
+    async def origin_page(request: web.Request):
+        origin.requests += 1
+        await origin.delay(rng)
+        article_id = int(request.match_info["article_id"])
+        paragraphs = "".join(f"<p>{p}</p>" for p in article_body(article_id).split("\n\n"))
+        html = (f"<html><head><title>压测文章 {article_id}</title></head><body>"
+                f"<h1>压测文章 {article_id}</h1><article>{paragraphs}</article></body></html>")
+        return web.Response(text=html, content_type="text/html", charset="utf-8")
+
+    llm_app = web.Application()
+    llm_app.router.add_post("/v1/chat/completions", chat_completions)
+    jina_app = web.Application()
+    jina_app.router.add_get("/{tail:.*}", jina_reader)
+    origin_app = web.Application()
+    origin_app.router.add_get("/a/{article_id}", origin_page)
+
+    apps = {LLM_HOST: llm_app, JINA_HOST: jina_app, ORIGIN_HOST: origin_app}
+    return apps, {"llm": llm, "jina": jina, "origin": origin}
+
+
+async def start_stubs(apps: Dict[str, web.Application]):
+    runners = []
+    ports = {}
+    for host, app in apps.items():
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        ports[host] = runner.addresses[0][1]
+        runners.append(runner)
+    return runners, ports
+
+
+class FakeWechatAPIClient:
+    """只记录发送的消息，模拟微信发送接口的少量耗时"""
+
+    def __init__(self, send_latency: float):
+        self.send_latency = send_latency
+        self.sent = 0
+
+    async def send_text_message(self, wxid: str, content: str, at=None):
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent += 1
+        return 0, 0, 0
+
+
+def card_xml(article_id: int, url: str) -> str:
+    return (f"<msg><appmsg appid=\"\" sdkver=\"0\"><title>压测文章 {article_id}</title>"
+            f"<des>压测文章 {article_id} 的描述</des><type>5</type><url>{url}</url></appmsg></msg>")
+
+
+def generate_messages(args, rng: random.Random) -> List[tuple]:
+    """按比例生成消息：普通聊天、链接分享、文章卡片、文件卡片、总结命令和追问"""
+    kinds = [("chat", 0.45), ("url", 0.15), ("article", 0.12), ("file", 0.08), ("summary", 0.12), ("qa", 0.08)]
+    messages = []
+    for i in range(args.messages):
+        roll = rng.random()
+        for kind, weight in kinds:
+            roll -= weight
+            if roll < 0:
+                break
+        chat_id = f"bench-group-{rng.randrange(args.chats)}@chatroom"
+        article_id = rng.randrange(args.articles)
+        url = f"http://{ORIGIN_HOST}/a/{article_id}"
+        message = {"MsgId": 100000 + i, "FromWxid": chat_id, "SenderWxid": f"wxid_user{rng.randrange(500)}",
+                   "IsGroup": True, "MsgType": 1}
+        if kind == "chat":
+            message["Content"] = rng.choice(["哈哈哈", "收到", "今天中午吃什么", "好的👌", "有人在吗？"])
+        elif kind == "url":
+            message["Content"] = f"大家看看这篇 {url} 写得不错"
+        elif kind == "summary":
+            message["Content"] = rng.choice([f"/总结 {url}", "/总结", f"/总结 主要讲了什么 {url}"])
+        elif kind == "qa":
+            message["Content"] = rng.choice(["问 这篇文章的主要观点是什么？", "问 文中提到的缓存策略有哪些？"])
+        else:
+            message["MsgType"] = 49
+            message["Content"] = card_xml(article_id, url)
+        messages.append((kind, message))
+    return messages
+
+
+async def create_plugin(args, ports: Dict[str, int], tmp_dir: str):
+    plugin = plugin_package.AutoSummaryOpenAI()
+    # 所有请求都指向本地桩服务
+    for config in plugin.sessions.configs.values():
+        config.proxy = ""
+    plugin.sessions = http_pool.UpstreamSessions(plugin.sessions.configs, resolver=StubResolver(ports))
+    plugin.jina_base_url = f"http://{JINA_HOST}"
+    plugin.llm_pool = llm_pool.LLMPool([llm_pool.PoolMember(
+        "stub", f"http://{LLM_HOST}/v1", "sk-bench", "bench-model",
+        max_concurrency=plugin.llm_max_concurrency, rpm=args.llm_rpm, tpm=0,
+    )], eject_failures=plugin.llm_eject_failures, eject_time=plugin.llm_eject_time)
+    plugin.openai_enable = True
+    plugin.auto_sum = True
+    plugin.white_url_list = []
+    plugin.black_url_list = []
+    plugin.white_group_list = []
+    plugin.black_group_list = []
+    plugin.no_redirect_hosts = [ORIGIN_HOST]
+    if plugin.store:
+        await plugin.store.close()
+        plugin.store = None
+    if args.persist:
+        plugin.store = store_module.PersistentStore(os.path.join(tmp_dir, "cache.db"),
+                                                    ttl=plugin.expiration_time,
+                                                    max_size_mb=plugin.persist_max_size_mb)
+    return plugin
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    apps, behaviors = build_stub_apps(args, rng)
+    runners, ports = await start_stubs(apps)
+    tmp_dir = tempfile.mkdtemp(prefix="autosummary-bench-")
+    plugin = await create_plugin(args, ports, tmp_dir)
+    bot = FakeWechatAPIClient(args.send_latency)
+    messages = generate_messages(args, rng)
+    handlers = {
+        "article": plugin.handle_article_message,
+        "file": plugin.handle_file_message,
+    }
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    failures = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in messages:
+        queue.put_nowait(item)
+
+    async def worker():
+        nonlocal failures
+        while True:
+            try:
+                kind, message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            handler = handlers.get(kind, plugin.handle_text_message)
+            start = time.perf_counter()
+            try:
+                await handler(bot, dict(message))
+            except Exception as e:
+                failures += 1
+                logger.error(f"处理消息失败: {e}")
+            latencies[kind].append(time.perf_counter() - start)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+
+    await plugin.close()
+    for runner in runners:
+        await runner.cleanup()
+
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    print(f"消息数: {len(messages)}, 并发: {args.concurrency}, 聊天数: {args.chats}, 文章数: {args.articles}")
+    print(f"总耗时: {elapsed:.2f}秒, 吞吐: {len(messages) / elapsed:.1f} 条/秒, 处理异常: {failures}, "
+          f"发送消息: {bot.sent}")
+    print(f"{'类型':<10}{'数量':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind in ["all"] + sorted(latencies):
+        ordered = all_latencies if kind == "all" else sorted(latencies[kind])
+        print(f"{kind:<10}{len(ordered):>8}{percentile(ordered, 0.5) * 1000:>10.1f}"
+              f"{percentile(ordered, 0.95) * 1000:>10.1f}{percentile(ordered, 0.99) * 1000:>10.1f}"
+              f"{(ordered[-1] if ordered else 0) * 1000:>10.1f}")
+    for name, behavior in behaviors.items():
+        print(f"桩服务 {name}: 请求 {behavior.requests}, 注入错误 {behavior.errors}, 注入429 {behavior.throttled}")
+    # Linux 下 ru_maxrss 单位为 KB
+    print(f"峰值RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MB"
+          + (f", Python分配峰值: {traced_peak / 1024 / 1024:.1f} MB" if traced_peak is not None else ""))
+    if args.dump_metrics:
+        print(plugin.metrics.render())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AutoSummaryOpenAI 端到端压测")
+    parser.add_argument("--messages", type=int, default=1000, help="消息总数")
+    parser.add_argument("--concurrency", type=int, default=32, help="同时处理的消息数")
+    parser.add_argument("--chats", type=int, default=50, help="群聊数")
+    parser.add_argument("--articles", type=int, default=200, help="不同文章数，越小缓存命中越多")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="openai桩服务生成完整回复的耗时（秒）")
+    parser.add_argument("--llm-error-rate", type=float, default=0.02, help="openai桩服务返回500的比例")
+    parser.add_argument("--llm-429-rate", type=float, default=0.02, help="openai桩服务返回429的比例")
+    parser.add_argument("--llm-rpm", type=float, default=0, help="插件侧openai每分钟请求数上限")
+    parser.add_argument("--jina-latency", type=float, default=0.5, help="Jina桩服务耗时（秒）")
+    parser.add_argument("--jina-error-rate", type=float, default=0.05, help="Jina桩服务返回500的比例")
+    parser.add_argument("--jina-429-rate", type=float, default=0.02, help="Jina桩服务返回429的比例")
+    parser.add_argument("--origin-latency", type=float, default=0.2, help="源站桩服务耗时（秒）")
+    parser.add_argument("--send-latency", type=float, default=0.01, help="模拟微信发送消息的耗时（秒）")
+    parser.add_argument("--persist", action="store_true", help="开启持久化存储（写入临时目录）")
+    parser.add_argument("--tracemalloc", action="store_true", help="统计Python内存分配峰值（会降低吞吐）")
+    parser.add_argument("--dump-metrics", action="store_true", help="结束后输出插件的Prometheus指标")
+    parser.add_argument("--log-level", default="WARNING", help="插件日志级别")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子")
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import asyncio
+import hashlib
+import heapq
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 分享链接中的追踪参数，不影响页面内容，归一化时移除
+# 只有含义明确的参数对所有域名生效；from、spm 等通用名称在很多网站上是内容参数
+# （例如 GitHub 的 ?ref=main），只在把它们用作追踪参数的分享域名上移除
+TRACKING_PARAMS = {
+    "isappinstalled", "clicktime", "mpshare", "share_source", "share_medium",
+    "share_from_user_hidden", "xhsshare", "ref_src",
+}
+TRACKING_PARAM_PREFIXES = ("utm_", "sharer_")
+# 域名（含子域名） -> 该域名额外移除的追踪参数
+HOST_TRACKING_PARAMS = {
+    "mp.weixin.qq.com": {"from", "scene", "srcid", "enterid"},
+    "xiaohongshu.com": {"appuid", "apptime", "exsource"},
+    "taobao.com": {"spm"},
+    "tmall.com": {"spm"},
+}
+
+
+def _is_tracking_param(key: str, host: str) -> bool:
+    key = key.lower()
+    if key in TRACKING_PARAMS or key.startswith(TRACKING_PARAM_PREFIXES):
+        return True
+    return any(key in params for domain, params in HOST_TRACKING_PARAMS.items()
+               if host == domain or host.endswith("." + domain))
+
+
+def normalize_url(url: str) -> str:
+    """归一化URL，用作跨聊天共享缓存的键
+
+    - scheme 和 host 转小写，去掉默认端口
+    - 移除锚点和追踪参数（utm_*、分享来源，以及微信、小红书、淘宝等分享域名特有的参数）；以 #/ 或 #! 开头的锚点是前端路由，
+      对应不同的页面，予以保留
+    - 剩余查询参数按键排序，保证同一篇文章得到同一个键
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+
+    host = parts.hostname or ""
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not _is_tracking_param(k, host)]
+    query.sort()
+
+    path = parts.path or "/"
+    fragment = parts.fragment if parts.fragment.startswith(("/", "!")) else ""
+    return urlunsplit((scheme, netloc, path, urlencode(query), fragment))
+
+
+class LRUCache:
+    """带容量上限和过期时间的LRU缓存
+
+    超过 max_size 时淘汰最久未使用的条目，超过 ttl 秒的条目在访问时视为不存在。
+    stale_ttl 大于0时，过期条目再保留 stale_ttl 秒，只能通过 get_stale() 取得（用于重新验证）。
+    on_evict 不为空时，因超过容量被淘汰的条目以 (键, 值) 调用它。
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 1800, stale_ttl: float = 0,
+                 on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.max_size = max(1, int(max_size))
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def _is_expired(self, timestamp: float, now: float) -> bool:
+        return self.ttl is not None and self.ttl > 0 and now - timestamp > self.ttl
+
+    def _is_dropped(self, timestamp: float, now: float) -> bool:
+        return self.ttl is not None and self.ttl > 0 and now - timestamp > self.ttl + self.stale_ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, timestamp = item
+        now = time.time()
+        if self._is_expired(timestamp, now):
+            if self._is_dropped(timestamp, now):
+                del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def get_stale(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """返回 (值, 写入时间)，已过期但仍在 stale_ttl 保留期内的条目同样返回"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if self._is_dropped(item[1], time.time()):
+            del self._data[key]
+            return None
+        return item
+
+    def set(self, key: Hashable, value: Any, timestamp: Optional[float] = None):
+        self._data[key] = (value, timestamp if timestamp is not None else time.time())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            evicted, (value, _) = self._data.popitem(last=False)
+            if self.on_evict:
+                self.on_evict(evicted, value)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return item[0] if item is not None else default
+
+    def clear(self):
+        self._data.clear()
+
+    def purge_expired(self) -> int:
+        """删除所有超过保留期的条目，返回删除数量（遍历全部条目，只在后台任务中调用）"""
+        if not self.ttl or self.ttl <= 0:
+            return 0
+        now = time.time()
+        expired = [key for key, (_, timestamp) in self._data.items() if self._is_dropped(timestamp, now)]
+        for key in expired:
+            del self._data[key]
+        return len(expired)
+
+
+class NegativeCache:
+    """记录抓取失败的URL，屏蔽期内的请求直接返回失败原因，不再等待抓取超时
+
+    连续第 n 次失败后屏蔽 base_ttl * 2^(n-1) 秒，不超过 max_ttl；抓取成功后清除记录。
+    超过 max_ttl 的两倍没有再失败的记录会被淘汰，之后的失败重新从 base_ttl 开始计算。
+    """
+
+    def __init__(self, base_ttl: float = 60, max_ttl: float = 3600, max_size: int = 2048):
+        self.base_ttl = base_ttl
+        self.max_ttl = max(max_ttl, base_ttl)
+        # 格式: {key: {"reason": 原因, "failures": 连续失败次数, "until": 屏蔽截止时间}}
+        self._data = LRUCache(max_size=max_size, ttl=self.max_ttl * 2)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Dict]:
+        """返回屏蔽期内的失败记录，不在屏蔽期内时返回 None"""
+        entry = self._data.get(key)
+        if entry is None or entry["until"] <= time.time():
+            return None
+        return entry
+
+    def add(self, key: Hashable, reason: str) -> Dict:
+        previous = self._data.get(key)
+        failures = previous["failures"] + 1 if previous else 1
+        ttl = min(self.base_ttl * 2 ** (failures - 1), self.max_ttl)
+        entry = {"reason": reason, "failures": failures, "until": time.time() + ttl}
+        self._data.set(key, entry)
+        return entry
+
+    def discard(self, key: Hashable):
+        self._data.pop(key)
+
+    def purge_expired(self) -> int:
+        return self._data.purge_expired()
+
+
+class BodyStore:
+    """按内容哈希去重的正文存储，带内存预算
+
+    相同内容只保存一份；超过 cold_after 秒未访问的正文在 compress_cold() 时用 zlib 压缩，
+    访问时解压并恢复为未压缩状态。占用超过 max_bytes 时淘汰最久未使用的正文。
+    占用按对象实际大小（sys.getsizeof）计算。
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, cold_after: float = 300, level: int = 6):
+        self.max_bytes = max(1, int(max_bytes))
+        self.cold_after = cold_after
+        self.level = level
+        # digest -> [正文(str) 或压缩数据(bytes), 占用字节数, 最后访问时间]
+        self._data: "OrderedDict[str, list]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.dedup_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._data
+
+    @staticmethod
+    def digest(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _replace(self, digest: str, value, now: float):
+        item = self._data[digest]
+        size = sys.getsizeof(value)
+        self.total_bytes += size - item[1]
+        item[0], item[1], item[2] = value, size, now
+
+    def _evict(self, keep: str):
+        while self.total_bytes > self.max_bytes and len(self._data) > 1:
+            digest, item = next(iter(self._data.items()))
+            if digest == keep:
+                self._data.move_to_end(digest)
+                continue
+            del self._data[digest]
+            self.total_bytes -= item[1]
+            self.evictions += 1
+
+    def put(self, text: str) -> str:
+        """保存正文，返回内容哈希"""
+        digest = self.digest(text)
+        now = time.time()
+        if digest in self._data:
+            self.dedup_hits += 1
+            self._data.move_to_end(digest)
+            self._data[digest][2] = now
+            return digest
+        size = sys.getsizeof(text)
+        self._data[digest] = [text, size, now]
+        self.total_bytes += size
+        self._evict(digest)
+        return digest
+
+    def get(self, digest: Optional[str]) -> Optional[str]:
+        item = self._data.get(digest) if digest else None
+        if item is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._data.move_to_end(digest)
+        value = item[0]
+        if isinstance(value, bytes):
+            value = zlib.decompress(value).decode("utf-8")
+            self._replace(digest, value, time.time())
+            self._evict(digest)
+        else:
+            item[2] = time.time()
+        return value
+
+    def compress_cold(self) -> int:
+        """压缩超过 cold_after 秒未访问的正文，返回压缩的数量（遍历全部条目，只在后台任务中调用）"""
+        now = time.time()
+        compressed = 0
+        for digest, item in list(self._data.items()):
+            value, size, last_access = item
+            if isinstance(value, bytes) or now - last_access < self.cold_after:
+                continue
+            packed = zlib.compress(value.encode("utf-8"), self.level)
+            if sys.getsizeof(packed) < size:
+                self._replace(digest, packed, last_access)
+                compressed += 1
+        return compressed
+
+    def stats(self) -> Dict:
+        compressed = sum(1 for value, _, _ in self._data.values() if isinstance(value, bytes))
+        return {
+            "bodies": len(self._data),
+            "compressed": compressed,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "dedup_hits": self.dedup_hits,
+            "evictions": self.evictions,
+        }
+
+
+class ExpiryIndex:
+    """按到期时间排序的过期索引（最小堆）
+
+    每次更新时间戳都会加入一个新的到期时间，旧的记录不会被删除，
+    弹出时由调用方根据当前数据判断是否真的过期。每条记录的入堆和出堆都是 O(log n)。
+    """
+
+    def __init__(self):
+        self._heap: list = []
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, key: Hashable, deadline: float):
+        self._seq += 1
+        heapq.heappush(self._heap, (deadline, self._seq, key))
+
+    def pop_due(self, now: float) -> list:
+        """弹出所有到期时间早于 now 的键"""
+        due = []
+        while self._heap and self._heap[0][0] < now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def clear(self):
+        self._heap.clear()
+
+
+class SingleFlight:
+    """合并相同键的并发请求
+
+    同一个键在执行期间只会启动一次，后续调用者等待同一个任务的结果。
+    单个调用者被取消不会影响共享任务和其他等待者；共享任务本身被取消或
+    抛出异常时，所有等待者都会收到同样的取消或异常。
+    """
+
+    def __init__(self):
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    def _on_done(self, key: Hashable, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # 标记异常已被读取，避免所有等待者都已取消时出现 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, k=key: self._on_done(k, t))
+        return await asyncio.shield(task)
+
+    def cancel_all(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
@@ -0,0 +1,69 @@
+import html
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional
+
+# appmsg 下需要的字段
+APPMSG_FIELDS = ("title", "des", "url", "type")
+
+# 每次喂给增量解析器的字符数
+FEED_SIZE = 4096
+
+
+def parse_card_xml(content: str) -> Optional[Dict]:
+    """从卡片消息的XML中提取标题、描述、URL、类型和来源应用名
+
+    使用增量解析器，只记录 appmsg 的直接子节点和 appname，已处理的节点立即清空；
+    所有字段都拿到后停止解析，不再处理后面的内容。XML无效、没有 appmsg 或 URL 为空时返回 None。
+    """
+    if not content or not content.lstrip().startswith("<"):
+        return None
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    fields: Dict[str, str] = {}
+    appname = None
+    found_appmsg = False
+    path = []
+
+    try:
+        done = False
+        for offset in range(0, len(content), FEED_SIZE):
+            parser.feed(content[offset:offset + FEED_SIZE])
+            for event, elem in parser.read_events():
+                if event == "start":
+                    path.append(elem.tag)
+                    if elem.tag == "appmsg" and len(path) <= 2:
+                        found_appmsg = True
+                    continue
+
+                path.pop()
+                tag = elem.tag
+                # appmsg 的直接子节点（appmsg 是根节点或 msg 的子节点）
+                if path and path[-1] == "appmsg" and len(path) <= 2 and tag in APPMSG_FIELDS:
+                    fields.setdefault(tag, elem.text or "")
+                elif tag == "appname" and appname is None:
+                    appname = elem.text or ""
+                elem.clear()
+
+                if appname is not None and len(fields) == len(APPMSG_FIELDS):
+                    done = True
+                    break
+            if done:
+                break
+        if not done:
+            parser.close()
+    except ET.ParseError:
+        # 已经拿到 appmsg 字段时忽略后面的格式错误
+        if not fields.get("url"):
+            return None
+
+    url = fields.get("url", "").strip()
+    if not found_appmsg or not url:
+        return None
+
+    return {
+        'title': fields.get("title", ""),
+        'description': fields.get("des", ""),
+        'url': html.unescape(url),
+        'is_xiaohongshu': appname == "小红书",
+        'type': fields.get("type", ""),
+    }
@@ -0,0 +1,103 @@
+import codecs
+import re
+from typing import Optional, Tuple
+
+import aiohttp
+
+# 每次从响应流读取的字节数
+CHUNK_SIZE = 64 * 1024
+
+# 在页面开头查找 <meta charset> 的字节数
+SNIFF_WINDOW = 4096
+
+# 可以交给HTML解析器的内容类型，响应头中没有 Content-Type 时同样允许
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "application/xml", "text/xml", "text/plain")
+
+# 明显不是网页的链接后缀，不发起请求
+BINARY_EXTENSIONS = (
+    ".apk", ".exe", ".dmg", ".msi", ".zip", ".rar", ".7z", ".tar", ".gz", ".bz2", ".iso",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".ico", ".svg",
+    ".mp3", ".wav", ".flac", ".aac", ".mp4", ".mov", ".avi", ".mkv", ".flv", ".m3u8",
+)
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([-\w.:]+)', re.IGNORECASE)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+
+
+def is_html_content_type(content_type: Optional[str]) -> bool:
+    if not content_type:
+        return True
+    return content_type.split(";", 1)[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+def has_binary_extension(url: str) -> bool:
+    path = url.split("#", 1)[0].split("?", 1)[0].lower()
+    return path.endswith(BINARY_EXTENSIONS)
+
+
+def _normalize_charset(charset: Optional[str]) -> Optional[str]:
+    if not charset:
+        return None
+    try:
+        name = codecs.lookup(charset.strip().strip('"\'')).name
+    except LookupError:
+        return None
+    # 中文页面声明的 gb2312/gbk 实际经常包含超出范围的字符
+    if name in ("gb2312", "gbk"):
+        return "gb18030"
+    return name
+
+
+def sniff_charset(head: bytes) -> Optional[str]:
+    """只在页面开头 SNIFF_WINDOW 字节内查找 BOM 和 <meta charset>"""
+    for bom, name in _BOMS:
+        if head.startswith(bom):
+            return name
+    match = _META_CHARSET_RE.search(head[:SNIFF_WINDOW])
+    return _normalize_charset(match.group(1).decode("ascii", "ignore")) if match else None
+
+
+def detect_charset(body: bytes, header_charset: Optional[str] = None) -> Optional[str]:
+    """确定页面编码：响应头 > BOM/meta > UTF-8 校验，都无法确定时返回 None
+
+    响应头中默认的 ISO-8859-1 不可信，按未声明处理。
+    """
+    charset = _normalize_charset(header_charset)
+    if charset and charset not in ("latin-1", "iso8859-1"):
+        return charset
+    charset = sniff_charset(body)
+    if charset:
+        return charset
+    try:
+        body.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        # 截断的页面末尾可能是不完整的多字节字符
+        if e.start >= len(body) - 3:
+            return "utf-8"
+        return None
+
+
+async def read_capped(response: aiohttp.ClientResponse, max_bytes: int) -> Tuple[bytes, bool]:
+    """流式读取响应体，超过 max_bytes 时停止读取，返回 (内容, 是否被截断)"""
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+        remaining = max_bytes - size
+        if len(chunk) > remaining:
+            chunks.append(chunk[:remaining])
+            return b"".join(chunks), True
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks), False
+
+
+async def read_text_capped(response: aiohttp.ClientResponse, max_bytes: int) -> Tuple[str, bool]:
+    """流式读取文本响应，超过 max_bytes 时截断，截断处不完整的字符被丢弃"""
+    body, truncated = await read_capped(response, max_bytes)
+    charset = detect_charset(body, response.charset) or "utf-8"
+    return body.decode(charset, errors="ignore" if truncated else "replace"), truncated
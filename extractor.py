@@ -0,0 +1,211 @@
+import re
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+try:
+    from bs4 import BeautifulSoup, CData, Comment, NavigableString, Tag
+    has_bs4 = True
+except ImportError:
+    has_bs4 = False
+
+# 优先使用更快的 lxml 解析器，未安装时使用内置的 html.parser
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# 提取前移除的无用元素
+REMOVED_TAGS = ['script', 'style', 'nav', 'header', 'footer', 'aside', 'form', 'iframe']
+
+# 常见的内容容器选择器
+CONTENT_SELECTORS = [
+    'article', 'main', '.content', '.article', '.post-content',
+    '[class*="content" i]', '[class*="article" i]',
+    '.story', '.entry-content', '.post-body',
+    '#content', '#article', '.body'
+]
+
+# 标题选择器，按优先级排列
+TITLE_SELECTORS = [
+    'h1',  # 最常见的标题标签
+    'title',  # HTML标题
+    '.title',  # 常见的标题类
+    '.article-title',  # 常见的文章标题类
+    '.post-title',  # 博客标题
+    '[class*="title" i]',  # 包含title的类
+]
+
+AD_SELECTOR = '[class*="ad" i], [class*="banner" i], [id*="ad" i], [class*="recommend" i]'
+
+
+class NodeStats:
+    """单个元素的统计信息，全部在一次自底向上的遍历中计算"""
+
+    __slots__ = ("text_length", "markup_length", "paragraph_count", "image_count", "link_text_length")
+
+    def __init__(self):
+        self.text_length = 0  # 等同于 len(get_text(strip=True))
+        self.markup_length = 0  # 近似于 len(str(element))
+        self.paragraph_count = 0  # 后代中 <p> 的数量
+        self.image_count = 0  # 后代中 <img> 的数量
+        self.link_text_length = 0  # 后代 <a> 的文本长度之和
+
+    @property
+    def score(self) -> float:
+        """与原有评分规则一致：文本长度、文本密度、段落和图片数量，链接占比过高时减半"""
+        text_density = self.text_length / self.markup_length if self.markup_length > 0 else 0
+        score = (
+            self.text_length * 1.0 +  # 文本长度很重要
+            text_density * 100 +  # 文本密度很重要
+            self.paragraph_count * 30 +  # 段落数量也很重要
+            self.image_count * 10  # 图片不太重要，但也是一个指标
+        )
+        # 减分项：如果包含许多链接，可能是导航或侧边栏
+        link_text_ratio = self.link_text_length / self.text_length if self.text_length > 0 else 0
+        if link_text_ratio > 0.5:
+            score *= 0.5
+        return score
+
+
+def _open_tag_length(tag: "Tag") -> int:
+    length = len(tag.name) + 2
+    for key, value in tag.attrs.items():
+        if isinstance(value, (list, tuple)):
+            value = " ".join(value)
+        length += len(key) + len(str(value)) + 4
+    return length
+
+
+def compute_node_stats(root: "Tag") -> Dict[int, NodeStats]:
+    """一次后序遍历计算所有元素的统计信息，返回 {id(element): NodeStats}
+
+    每个节点只访问一次，避免对嵌套的候选元素反复调用 get_text / str / find_all。
+    使用显式栈，层级很深的页面也不会超出递归限制。
+    """
+    stats: Dict[int, NodeStats] = {}
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if not visited:
+            stack.append((node, True))
+            for child in node.contents:
+                if isinstance(child, Tag):
+                    stack.append((child, False))
+            continue
+
+        node_stats = NodeStats()
+        node_stats.markup_length = _open_tag_length(node)
+        if not node.can_be_empty_element:
+            node_stats.markup_length += len(node.name) + 3
+        for child in node.contents:
+            if isinstance(child, Tag):
+                child_stats = stats[id(child)]
+                node_stats.text_length += child_stats.text_length
+                node_stats.markup_length += child_stats.markup_length
+                node_stats.paragraph_count += child_stats.paragraph_count + (child.name == 'p')
+                node_stats.image_count += child_stats.image_count + (child.name == 'img')
+                node_stats.link_text_length += child_stats.link_text_length
+                if child.name == 'a':
+                    node_stats.link_text_length += child_stats.text_length
+            elif isinstance(child, NavigableString):
+                if isinstance(child, Comment):
+                    node_stats.markup_length += len(child) + 7
+                    continue
+                node_stats.markup_length += len(child)
+                # get_text 只统计普通文本和 CDATA
+                if type(child) is NavigableString or isinstance(child, CData):
+                    node_stats.text_length += len(child.strip())
+        stats[id(node)] = node_stats
+    return stats
+
+
+def _find_title(soup: "BeautifulSoup") -> Optional[str]:
+    for selector in TITLE_SELECTORS:
+        candidate = soup.select_one(selector)
+        if candidate:
+            text = candidate.get_text().strip()
+            if text:
+                return text
+    return None
+
+
+def _find_candidates(soup: "BeautifulSoup", stats: Dict[int, NodeStats]) -> List["Tag"]:
+    candidates = []
+    seen = set()
+    # 1. 尝试找常见的内容容器，同一元素只保留一次
+    for selector in CONTENT_SELECTORS:
+        for element in soup.select(selector):
+            if id(element) not in seen:
+                seen.add(id(element))
+                candidates.append(element)
+    if candidates:
+        return candidates
+
+    # 2. 如果没有找到明确的内容容器，寻找具有最多文本的 p 或 div 元素
+    max_elem = None
+    max_length = 100  # 只考虑有实际内容的元素
+    for elem in soup.find_all(['p', 'div']):
+        length = stats[id(elem)].text_length
+        if length > max_length:
+            max_elem, max_length = elem, length
+    if max_elem is None:
+        return []
+
+    # 如果是div，直接添加；如果是p，尝试找包含多个段落的父元素
+    if max_elem.name != 'div':
+        parent = max_elem.parent
+        if parent is not None and id(parent) in stats and stats[id(parent)].paragraph_count > 3:
+            return [parent]
+    return [max_elem]
+
+
+def extract_article(page, encoding: Optional[str] = None) -> Optional[str]:
+    """从HTML中提取标题和正文
+
+    Args:
+        page: 网页内容，bytes 或 str
+        encoding: 已知的编码，为 None 时由解析器检测
+
+    Returns:
+        str: "标题: xxx\\n\\n正文" 格式的内容，找不到正文时返回 None
+    """
+    if not has_bs4:
+        logger.error("BeautifulSoup库未安装，无法提取网页内容")
+        return None
+
+    soup = BeautifulSoup(page, HTML_PARSER, from_encoding=encoding if isinstance(page, bytes) else None)
+
+    # 移除无用元素
+    for element in soup(REMOVED_TAGS):
+        element.extract()
+
+    title = _find_title(soup)
+    stats = compute_node_stats(soup)
+
+    # 使用预先计算的统计信息评分，选择最佳内容元素
+    best_content = None
+    max_score = 0
+    for element in _find_candidates(soup, stats):
+        score = stats[id(element)].score
+        if score > max_score:
+            max_score = score
+            best_content = element
+
+    if best_content is None:
+        return None
+
+    # 首先移除内容中可能的广告或无关元素
+    for ad in best_content.select(AD_SELECTOR):
+        ad.extract()
+
+    # 获取并清理文本，移除多余的空白行
+    content_text = best_content.get_text(separator='\n', strip=True)
+    content_text = re.sub(r'\n{3,}', '\n\n', content_text)
+
+    result = ""
+    if title:
+        result += f"标题: {title}\n\n"
+    result += content_text
+    return result
@@ -0,0 +1,172 @@
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .cache import LRUCache
+
+# 抓取方式：输入最终URL，返回通过质量检查的正文，失败返回 None
+Fetcher = Callable[[str], Awaitable[Optional[str]]]
+
+
+class StrategyStats:
+    """一种抓取方式在一个域名上的成功率和耗时统计"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.successes = 0
+        self.consecutive_failures = 0
+        self.latency_ewma: Optional[float] = None
+        self.latencies = deque(maxlen=50)
+        self.last_attempt = 0.0
+
+    def success_rate(self) -> float:
+        # 加一平滑，样本很少时不会得到 0 或 1
+        return (self.successes + 1) / (self.attempts + 2)
+
+    def cost(self) -> float:
+        """预计拿到正文的耗时（平均耗时 / 成功率），没有样本时为无穷大"""
+        if self.latency_ewma is None:
+            return float("inf")
+        return self.latency_ewma / self.success_rate()
+
+    def p95(self) -> Optional[float]:
+        """最近耗时的 p95，样本不足时返回 None"""
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def to_dict(self) -> Dict:
+        return {
+            "attempts": self.attempts,
+            "successes": self.successes,
+            "consecutive_failures": self.consecutive_failures,
+            "latency_ewma": self.latency_ewma,
+            "latencies": [round(value, 3) for value in self.latencies],
+            "last_attempt": self.last_attempt,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "StrategyStats":
+        stats = cls()
+        stats.attempts = int(data.get("attempts", 0))
+        stats.successes = int(data.get("successes", 0))
+        stats.consecutive_failures = int(data.get("consecutive_failures", 0))
+        stats.latency_ewma = data.get("latency_ewma")
+        stats.latencies.extend(data.get("latencies", []))
+        stats.last_attempt = float(data.get("last_attempt", 0.0))
+        return stats
+
+
+class FetcherRegistry:
+    """抓取方式注册表，按域名记录每种方式的成功率和耗时，为新请求排出尝试顺序
+
+    - 预计耗时（平均耗时 / 成功率）最小的方式排在最前，没有样本的方式按注册顺序排在后面
+    - 在该域名上连续失败 fail_threshold 次的方式被跳过，距上次尝试超过 probe_interval 秒后
+      放在最后作为兜底，成功一次即恢复
+    - 以 explore_rate 的概率把随机一种其他方式提到最前，让统计数据能够更新
+    """
+
+    def __init__(self, fail_threshold: int = 3, explore_rate: float = 0.05, probe_interval: float = 600,
+                 max_domains: int = 2048, alpha: float = 0.3):
+        self.fail_threshold = max(1, int(fail_threshold))
+        self.explore_rate = explore_rate
+        self.probe_interval = probe_interval
+        self.alpha = alpha
+        self._fetchers: Dict[str, Fetcher] = {}
+        self._labels: Dict[str, str] = {}
+        # 域名 -> {方式名: StrategyStats}
+        self._domains = LRUCache(max_size=max_domains, ttl=0)
+        # 统计有变化、还没有写入持久化存储的域名
+        self._dirty = set()
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._fetchers)
+
+    def register(self, name: str, fetcher: Fetcher, label: str = ""):
+        self._fetchers[name] = fetcher
+        self._labels[name] = label or name
+
+    def get(self, name: str) -> Fetcher:
+        return self._fetchers[name]
+
+    def label(self, name: str) -> str:
+        return self._labels.get(name, name)
+
+    def _domain_stats(self, domain: str) -> Dict[str, StrategyStats]:
+        stats = self._domains.get(domain)
+        if stats is None:
+            stats = {}
+            self._domains.set(domain, stats)
+        return stats
+
+    def stats(self, domain: str, name: str) -> StrategyStats:
+        domain_stats = self._domain_stats(domain)
+        if name not in domain_stats:
+            domain_stats[name] = StrategyStats()
+        return domain_stats[name]
+
+    def is_failing(self, stats: StrategyStats) -> bool:
+        return stats.consecutive_failures >= self.fail_threshold
+
+    def record(self, domain: str, name: str, ok: Optional[bool], elapsed: float):
+        """记录一次抓取结果，ok 为 None 表示被取消（对冲中被抢先）
+
+        被取消时的耗时只是实际耗时的下限，不计入耗时样本，只在超过平均耗时时把平均耗时提高到该值。
+        """
+        stats = self.stats(domain, name)
+        self._dirty.add(domain)
+        if ok is None:
+            if stats.latency_ewma is not None and elapsed > stats.latency_ewma:
+                stats.latency_ewma = elapsed
+            return
+        stats.latencies.append(elapsed)
+        stats.latency_ewma = elapsed if stats.latency_ewma is None else \
+            self.alpha * elapsed + (1 - self.alpha) * stats.latency_ewma
+        stats.attempts += 1
+        stats.last_attempt = time.time()
+        if ok:
+            stats.successes += 1
+            stats.consecutive_failures = 0
+        else:
+            stats.consecutive_failures += 1
+
+    def rank(self, domain: str) -> List[str]:
+        """返回该域名的尝试顺序，第一个为首选方式"""
+        now = time.time()
+        ranked = sorted(self._fetchers, key=lambda name: self.stats(domain, name).cost())
+        healthy = [name for name in ranked if not self.is_failing(self.stats(domain, name))]
+        if not healthy:
+            # 所有方式都在失败时仍然全部尝试
+            return ranked
+        order = healthy + [
+            name for name in ranked
+            if name not in healthy and now - self.stats(domain, name).last_attempt >= self.probe_interval
+        ]
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            explored = random.choice([name for name in ranked if name != order[0]])
+            order = [explored] + [name for name in order if name != explored]
+        return order
+
+    def latency_p95(self, domain: str, name: str) -> Optional[float]:
+        return self.stats(domain, name).p95()
+
+    def export(self, domain: str) -> Dict:
+        return {name: stats.to_dict() for name, stats in self._domain_stats(domain).items()}
+
+    def restore(self, domain: str, data: Dict):
+        """恢复持久化的统计，已在内存中产生的统计优先"""
+        domain_stats = self._domain_stats(domain)
+        for name, item in data.items():
+            if name in self._fetchers and name not in domain_stats:
+                domain_stats[name] = StrategyStats.from_dict(item)
+
+    def pop_dirty(self) -> Dict[str, Dict]:
+        """取出统计有变化的域名及其统计数据，已被淘汰的域名不再写入"""
+        dirty, self._dirty = self._dirty, set()
+        return {domain: self.export(domain) for domain in dirty if self._domains.get(domain) is not None}
+
+    def __len__(self) -> int:
+        return len(self._domains)
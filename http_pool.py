@@ -0,0 +1,97 @@
+import asyncio
+from typing import Dict, Optional
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from loguru import logger
+
+# 上游类型：openai接口、Jina Reader、文章源站（重定向检查、通用提取方法、条件请求）
+UPSTREAMS = ("llm", "jina", "origin")
+
+# 各上游连接池的默认参数：openai和Jina主机固定，保持较多长连接；源站主机分散，每个主机只保留少量连接
+DEFAULT_POOL_CONFIG = {
+    "llm": {"limit": 32, "limit_per_host": 16, "keepalive_timeout": 60, "dns_cache_ttl": 300},
+    "jina": {"limit": 16, "limit_per_host": 16, "keepalive_timeout": 60, "dns_cache_ttl": 300},
+    "origin": {"limit": 64, "limit_per_host": 4, "keepalive_timeout": 15, "dns_cache_ttl": 60},
+}
+
+
+class PoolConfig:
+    """一类上游的连接池参数，dns_cache_ttl 为0时不缓存DNS解析结果，proxy 为空时直连"""
+
+    def __init__(self, limit: int = 32, limit_per_host: int = 8, keepalive_timeout: float = 30,
+                 dns_cache_ttl: int = 300, proxy: str = ""):
+        self.limit = max(1, int(limit))
+        self.limit_per_host = max(0, int(limit_per_host))
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.proxy = proxy
+
+    @classmethod
+    def from_dict(cls, upstream: str, values: Dict, proxy: str = "") -> "PoolConfig":
+        """读取配置中的 [AutoSummaryOpenAI.Connections.<upstream>]，未填写的项使用默认值"""
+        merged = dict(DEFAULT_POOL_CONFIG[upstream], proxy=proxy)
+        merged.update({key: value for key, value in values.items() if key in merged})
+        return cls(**merged)
+
+
+class UpstreamSessions:
+    """每类上游使用独立的 aiohttp 会话和连接池
+
+    源站请求再多也不会占满 openai 和 Jina 的连接；会话在第一次使用时创建，close() 时全部关闭。
+    """
+
+    def __init__(self, configs: Dict[str, PoolConfig], resolver: Optional[AbstractResolver] = None):
+        self.configs = configs
+        # 自定义DNS解析器（压测时把域名解析到本地桩服务），为空时使用 aiohttp 默认的解析器
+        self.resolver = resolver
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def proxy(self, upstream: str) -> Optional[str]:
+        return self.configs[upstream].proxy or None
+
+    def _create(self, upstream: str) -> aiohttp.ClientSession:
+        config = self.configs[upstream]
+        connector = aiohttp.TCPConnector(
+            limit=config.limit,
+            limit_per_host=config.limit_per_host,
+            keepalive_timeout=config.keepalive_timeout,
+            use_dns_cache=config.dns_cache_ttl > 0,
+            ttl_dns_cache=config.dns_cache_ttl if config.dns_cache_ttl > 0 else None,
+            resolver=self.resolver,
+        )
+        return aiohttp.ClientSession(connector=connector)
+
+    async def get(self, upstream: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(upstream)
+        if session is None or session.closed:
+            # 在异步函数里真正创建
+            session = self._sessions[upstream] = self._create(upstream)
+        return session
+
+    async def warm_up(self, upstream: str, url: str, proxy: Optional[str] = None, timeout: float = 10) -> bool:
+        """向 url 发送一次HEAD请求，提前完成DNS解析和TCP/TLS握手，连接留在连接池中供后续请求复用
+
+        只关心连接是否建立，任何HTTP状态码都算成功。
+        """
+        session = await self.get(upstream)
+        try:
+            async with session.head(url, proxy=proxy if proxy is not None else self.proxy(upstream),
+                                    allow_redirects=False,
+                                    timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                await response.read()
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"预热 {upstream} 连接失败: {url}, {e}")
+            return False
+
+    async def close(self):
+        sessions = [session for session in self._sessions.values() if not session.closed]
+        self._sessions.clear()
+        for session in sessions:
+            await session.close()
+        if sessions:
+            # 给 SSL 连接留出关闭的时间，避免退出时出现未关闭连接的警告
+            await asyncio.sleep(0.25)
@@ -0,0 +1,176 @@
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .ratelimit import TokenBucket
+
+
+class PoolMember:
+    """openai 端点池中的一个成员（一个 base-url + api-key + model 组合）
+
+    记录进行中的请求数、连续失败次数和延迟统计。连续失败达到阈值后被摘除一段时间，
+    到期后只放行一个探测请求，成功则恢复，失败则摘除时间加倍。
+    """
+
+    def __init__(self, name: str, base_url: str, api_key: str, model: str, weight: float = 1,
+                 max_concurrency: int = 4, http_proxy: str = "", rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.weight = max(float(weight), 0.01)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.http_proxy = http_proxy
+        # 每个 key 的配额独立计算
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.eject_count = 0
+        self.probing = False
+
+        self.requests = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.last_error = ""
+
+    def is_ejected(self, now: float) -> bool:
+        return self.ejected_until > now
+
+    def is_available(self, now: float) -> bool:
+        if self.outstanding >= self.max_concurrency or self.is_ejected(now):
+            return False
+        # 摘除到期后处于探测状态，同一时间只放行一个请求
+        return not (self.eject_count and self.probing)
+
+    def load(self) -> float:
+        """按权重折算的负载，越小越优先"""
+        return (self.outstanding + 1) / self.weight
+
+    def stats(self) -> Dict:
+        return {
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_avg": self.latency_total / (self.requests - self.errors) if self.requests > self.errors else 0.0,
+            "latency_ewma": self.latency_ewma or 0.0,
+            "ejected": self.is_ejected(time.monotonic()),
+            "last_error": self.last_error,
+        }
+
+
+class LLMPool:
+    """openai 端点池
+
+    按最少进行中请求（除以权重）选择成员，成员的并发数已满时跳过，全部不可用时等待。
+    连续失败 eject_failures 次的成员被摘除 eject_time 秒，之后自动探测恢复。
+    摘除后没有其他可用成员时不摘除（例如只配置了一个端点），请求仍按重试退避发送，
+    避免所有请求一起等待摘除结束。
+    """
+
+    def __init__(self, members: List[PoolMember], eject_failures: int = 3,
+                 eject_time: float = 30, max_eject_time: float = 300):
+        self.members = members
+        self.eject_failures = max(1, int(eject_failures))
+        self.eject_time = eject_time
+        self.max_eject_time = max_eject_time
+        # 成员状态变化（归还名额）时被设置，唤醒所有等待者后换成新的 Event
+        self._changed = asyncio.Event()
+
+    def _candidates(self, exclude: set) -> List[PoolMember]:
+        now = time.monotonic()
+        return [m for m in self.members if m.name not in exclude and m.is_available(now)]
+
+    def has_available(self, exclude: Optional[set] = None) -> bool:
+        """除 exclude 外是否有可以立即使用的成员"""
+        return bool(self._candidates(exclude or set()))
+
+    def _pick(self, exclude: set) -> Optional[PoolMember]:
+        candidates = self._candidates(exclude)
+        if not candidates:
+            return None
+        best = min(m.load() for m in candidates)
+        member = random.choice([m for m in candidates if m.load() == best])
+        if member.eject_count:
+            member.probing = True
+            logger.info(f"openai端点 {member.name} 摘除到期，发送探测请求")
+        return member
+
+    def _next_wakeup(self) -> Optional[float]:
+        """被摘除的成员中最早恢复的剩余秒数"""
+        now = time.monotonic()
+        waits = [m.ejected_until - now for m in self.members if m.is_ejected(now)]
+        return max(min(waits), 0.01) if waits else None
+
+    async def acquire(self, exclude: Optional[set] = None, deadline: Optional[float] = None) -> Optional[PoolMember]:
+        """选择一个成员并占用一个并发名额，截止时间前没有可用成员时返回 None
+
+        exclude 为本次调用中已经失败过的成员名，重试时优先换一个成员；
+        除此之外没有成员时仍然可以选回这些成员。
+        """
+        exclude = exclude or set()
+        while True:
+            member = self._pick(exclude) or (self._pick(set()) if exclude else None)
+            if member is not None:
+                member.outstanding += 1
+                return member
+            timeout = self._next_wakeup()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                timeout = min(timeout, remaining) if timeout is not None else remaining
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, member: PoolMember, ok: Optional[bool], elapsed: float = 0.0, error: str = ""):
+        """归还并发名额并记录结果
+
+        ok 为 None 表示结果不反映端点是否可用（请求没有发出、被取消、429 或 4xx 等），不计入统计。
+        """
+        member.outstanding -= 1
+        was_probing = member.probing
+        member.probing = False
+        if ok is not None:
+            member.requests += 1
+        if ok:
+            member.latency_total += elapsed
+            member.latency_ewma = elapsed if member.latency_ewma is None else \
+                member.latency_ewma * 0.8 + elapsed * 0.2
+            member.consecutive_failures = 0
+            if member.eject_count:
+                logger.info(f"openai端点 {member.name} 探测成功，恢复使用")
+            member.eject_count = 0
+        elif ok is not None:
+            member.errors += 1
+            member.last_error = error
+            member.consecutive_failures += 1
+            now = time.monotonic()
+            # 摘除前已经发出的请求陆续失败时不再延长摘除时间
+            if (was_probing or member.consecutive_failures >= self.eject_failures) and not member.is_ejected(now):
+                self._eject(member, now, error)
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _eject(self, member: PoolMember, now: float, error: str):
+        if not any(not m.is_ejected(now) for m in self.members if m is not member):
+            if member.consecutive_failures == self.eject_failures:
+                logger.warning(f"openai端点 {member.name} 连续失败 {member.consecutive_failures} 次，"
+                               f"没有其他可用端点，不摘除: {error}")
+            return
+        member.eject_count += 1
+        eject = min(self.eject_time * (2 ** (member.eject_count - 1)), self.max_eject_time)
+        member.ejected_until = now + eject
+        logger.warning(f"openai端点 {member.name} 连续失败 {member.consecutive_failures} 次，"
+                       f"摘除 {eject:.0f} 秒: {error}")
+
+    def stats(self) -> Dict[str, Dict]:
+        return {m.name: m.stats() for m in self.members}
@@ -1,45 +1,108 @@
 from utils.plugin_base import PluginBase
-from utils.decorators import on_text_message, on_file_message, on_article_message
+from utils.decorators import on_text_message, on_file_message, on_article_message, schedule
 import aiohttp
 import asyncio
 import re
 import os
-import sys
 import tomllib
 import time
 from loguru import logger
-from typing import Dict, Optional, TYPE_CHECKING
+from typing import Awaitable, Callable, Dict, Optional, TYPE_CHECKING
 import json
 import html
-import xml.etree.ElementTree as ET
-from urllib.parse import quote
+from urllib.parse import quote, urlsplit
 import random
-# 分别尝试导入每个库，以便更精确地识别哪个库缺失
-has_bs4 = True
-has_requests = True
-has_requests_html = True
-
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
+import functools
+
+from .cache import BodyStore, ExpiryIndex, LRUCache, NegativeCache, SingleFlight, normalize_url
+from .cards import parse_card_xml
+from .download import (detect_charset, has_binary_extension, is_html_content_type, read_capped,
+                       read_text_capped)
+from .extractor import HTML_PARSER, extract_article, has_bs4
+from .fetchers import FetcherRegistry
+from .http_pool import UPSTREAMS, PoolConfig, UpstreamSessions
+from .llm_pool import LLMPool, PoolMember
+from .metrics import Histogram, MetricsRegistry, timed
+from .ratelimit import RetryableError, TokenBucket, backoff_delay, estimate_tokens, parse_retry_after
+from .retrieval import BM25Index
+from .router import CommandRouter
+from .scheduler import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NAMES, LLMScheduler, SchedulerSaturated
+from .store import PersistentStore
+
+if not has_bs4:
     logger.warning("BeautifulSoup库未安装，无法使用部分内容提取功能")
-    has_bs4 = False
-try:
-    import requests
-except ImportError:
-    logger.warning("requests库未安装，无法使用部分内容提取功能")
-    has_requests = False
 
 # 动态内容提取方法已移除，不再需要requests_html和lxml_html_clean
 has_requests_html = False
 
-# 总体判断是否可以使用高级内容提取方法
-can_use_advanced_extraction = has_bs4 and has_requests
+# 总体判断是否可以使用高级内容提取方法（网页请求使用 aiohttp，只需要 BeautifulSoup）
+can_use_advanced_extraction = has_bs4
 
 # 类型提示导入
 if TYPE_CHECKING:
     from WechatAPI import WechatAPIClient
 
+
+def instrument_stage(stage: str):
+    """记录处理阶段的耗时和结果（ok/empty/error/cancelled），返回 None 视为 empty"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with timed(self.stage_seconds, self.stage_total, stage=stage) as timer:
+                result = await func(self, *args, **kwargs)
+                if result is None:
+                    timer.outcome = "empty"
+                return result
+        return wrapper
+    return decorator
+
+
+class SummaryDelivery:
+    """分段发送总结内容
+
+    流式生成时先发送第一段，完成后只发送剩余部分；同时记录首条消息耗时和总耗时。
+    """
+
+    def __init__(self, bot: 'WechatAPIClient', chat_id: str, histogram: Optional[Histogram] = None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.histogram = histogram
+        self.start_time = time.time()
+        self.first_message_time: Optional[float] = None
+        self.sent_prefix = ""
+
+    async def send_first_section(self, section: str):
+        if not section or self.sent_prefix:
+            return
+        try:
+            await self.bot.send_text_message(self.chat_id, section)
+        except Exception as e:
+            # 第一段发送失败时，最后会完整发送总结
+            logger.error(f"发送总结第一段失败: {e}")
+            return
+        self.sent_prefix = section
+        self.first_message_time = time.time()
+        if self.histogram:
+            self.histogram.observe(self.first_message_time - self.start_time, phase="first_section")
+        logger.info(f"已发送总结第一段，首条消息耗时: {self.first_message_time - self.start_time:.2f}秒")
+
+    async def send_summary(self, summary: str):
+        if self.sent_prefix and summary.startswith(self.sent_prefix):
+            rest = summary[len(self.sent_prefix):].strip()
+            if rest:
+                await self.bot.send_text_message(self.chat_id, rest)
+        else:
+            await self.bot.send_text_message(self.chat_id, f"{summary}")
+        now = time.time()
+        if self.first_message_time is None:
+            self.first_message_time = now
+        if self.histogram:
+            self.histogram.observe(self.first_message_time - self.start_time, phase="first_message")
+            self.histogram.observe(now - self.start_time, phase="total")
+        logger.info(f"总结已发送，首条消息耗时: {self.first_message_time - self.start_time:.2f}秒, "
+                    f"总耗时: {now - self.start_time:.2f}秒")
+
+
 class AutoSummaryOpenAI(PluginBase):
     description = "自动总结文本内容和卡片消息"
     author = "pigracing"
@@ -62,13 +125,90 @@ class AutoSummaryOpenAI(PluginBase):
         self.model = openai_config.get("model", "")
         self.openai_base_url = openai_config.get("base-url", "")
         self.http_proxy = openai_config.get("http-proxy", "")
+        # 流式输出，生成第一段后先发送给用户
+        self.openai_stream = openai_config.get("stream", True)
 
         settings = self.config.get("Settings", {})
         self.max_text_length = settings.get("max_text_length", 8000)
+        # 网页和 Jina 返回内容的下载上限，超过后停止读取
+        self.max_download_bytes = int(settings.get("max_download_kb", 2048) * 1024)
+        # 分块总结（默认关闭）：超过 max_text_length 的长文分块并发总结后再汇总，
+        # 每篇长文最多调用 max_chunks + 1 次openai，分块请求与其他请求共用调度器的名额
+        self.chunked_summary = settings.get("chunked_summary", False)
+        self.chunk_size = settings.get("chunk_size", self.max_text_length)
+        self.max_chunks = settings.get("max_chunks", 8)
+        self.chunk_concurrency = settings.get("chunk_concurrency", 4)
+        # 追问：原文按 qa_chunk_size 切片建立本地 BM25 索引，每次只把最相关的 qa_top_k 个片段发给openai
+        self.qa_chunk_size = settings.get("qa_chunk_size", 600)
+        self.qa_top_k = settings.get("qa_top_k", 4)
+        # openai请求调度：同时进行的请求数上限和排队上限，显式命令和追问优先于自动总结
+        self.llm_max_concurrency = settings.get("llm_max_concurrency", 8)
+        self.llm_max_queue = settings.get("llm_max_queue", 32)
+        # 上游限流：每分钟请求数/token数，0表示不限制；失败时在截止时间内按指数退避重试
+        self.llm_rpm = settings.get("llm_rpm", 0)
+        self.llm_tpm = settings.get("llm_tpm", 0)
+        self.llm_max_retries = settings.get("llm_max_retries", 2)
+        self.llm_deadline = settings.get("llm_deadline", 120)
+        # 端点池：连续失败 llm_eject_failures 次的端点摘除 llm_eject_time 秒后自动探测恢复
+        self.llm_eject_failures = settings.get("llm_eject_failures", 3)
+        self.llm_eject_time = settings.get("llm_eject_time", 30)
+        self.jina_base_url = settings.get("jina_base_url", "https://r.jina.ai").rstrip("/")
+        self.jina_rpm = settings.get("jina_rpm", 20)
+        self.jina_max_retries = settings.get("jina_max_retries", 1)
         self.black_url_list = settings.get("black_url_list", [])
         self.white_url_list = settings.get("white_url_list", [])
         # 从配置文件中读取缓存过期时间
         self.expiration_time = settings.get("expiration_time", 1800)  # 默认30分钟
+        # 跨聊天共享的总结缓存容量
+        self.summary_cache_size = settings.get("summary_cache_size", 512)
+        # 重新验证：过期的内容和总结再保留 stale_keep_time 秒，刷新时先发条件请求，
+        # 源站返回304或重新抓取的内容哈希不变时沿用已有总结，不再调用openai
+        self.revalidate_enable = settings.get("revalidate_enable", True)
+        self.stale_keep_time = settings.get("stale_keep_time", 86400) if self.revalidate_enable else 0
+        # 抓取失败的链接在 failure_cache_time 秒内直接回复失败原因，再次失败时屏蔽时间加倍，最长 failure_cache_max_time 秒
+        self.failure_cache_time = settings.get("failure_cache_time", 60)
+        self.failure_cache_max_time = settings.get("failure_cache_max_time", 3600)
+        # 预取：群聊中非@bot的链接存入后立即在后台抓取正文，最多同时进行 prefetch_concurrency 个，
+        # 每分钟抓取的正文不超过 prefetch_kb_per_minute KB（0表示不限制）；
+        # Jina 剩余令牌少于 prefetch_jina_reserve 个时跳过预取，把额度留给总结命令
+        self.prefetch_enable = settings.get("prefetch_enable", False)
+        self.prefetch_concurrency = settings.get("prefetch_concurrency", 2)
+        self.prefetch_kb_per_minute = settings.get("prefetch_kb_per_minute", 2048)
+        self.prefetch_jina_reserve = settings.get("prefetch_jina_reserve", 5)
+        # 本地持久化存储，重启后仍可使用已抓取的内容和总结
+        self.persist_enable = settings.get("persist_enable", True)
+        self.persist_path = settings.get("persist_path", "data/cache.db")
+        if not os.path.isabs(self.persist_path):
+            self.persist_path = os.path.join(os.path.dirname(__file__), self.persist_path)
+        self.persist_max_size_mb = settings.get("persist_max_size_mb", 100)
+        # 内存预算：正文按内容哈希去重，闲置后压缩，超过预算时淘汰最久未使用的正文
+        self.memory_budget_mb = settings.get("memory_budget_mb", 64)
+        self.body_cold_after = settings.get("body_cold_after", 300)
+        # 每类聊天状态（最近链接、卡片、总结引用）最多保留的聊天数
+        self.max_chat_states = settings.get("max_chat_states", 1000)
+        # 重定向检查：已知不会重定向的域名直接跳过，短链接域名在抓取前解析
+        self.redirect_timeout = settings.get("redirect_timeout", 5)
+        self.no_redirect_hosts = settings.get("no_redirect_hosts", [
+            "mp.weixin.qq.com", "github.com", "www.zhihu.com", "zhuanlan.zhihu.com", "www.xiaohongshu.com"
+        ])
+        self.short_link_hosts = settings.get("short_link_hosts", [
+            "t.cn", "url.cn", "dwz.cn", "b23.tv", "xhslink.com", "bit.ly", "t.co", "tinyurl.com", "v.douyin.com"
+        ])
+        # 指标导出：metrics_port 大于0时在本地监听 /metrics，metrics_file 非空时定时写入文件
+        self.metrics_host = settings.get("metrics_host", "127.0.0.1")
+        self.metrics_port = settings.get("metrics_port", 0)
+        self.metrics_file = settings.get("metrics_file", "")
+        if self.metrics_file and not os.path.isabs(self.metrics_file):
+            self.metrics_file = os.path.join(os.path.dirname(__file__), self.metrics_file)
+        # 对冲抓取：首选抓取方式在指定秒数内未返回时并行启动排在第二的方式
+        self.hedge_enable = settings.get("hedge_enable", True)
+        self.hedge_delay = settings.get("hedge_delay", 5)
+        # 按域名选择抓取方式：连续失败 strategy_fail_threshold 次的方式被跳过，
+        # 以 strategy_explore_rate 的概率尝试其他方式，统计保存在持久化存储中
+        self.strategy_fail_threshold = settings.get("strategy_fail_threshold", 3)
+        self.strategy_explore_rate = settings.get("strategy_explore_rate", 0.05)
+        self.strategy_probe_interval = settings.get("strategy_probe_interval", 600)
+        self.strategy_stats_ttl = settings.get("strategy_stats_ttl", 7 * 86400)
 
         # 加载新的配置项
         # 总结命令触发词
@@ -86,6 +226,9 @@ class AutoSummaryOpenAI(PluginBase):
         # 追问命令触发词
         self.qa_trigger = self.config.get("qa_trigger", "问")
 
+        # 初始化时编译好的命令路由，每条消息只匹配一次
+        self.router = CommandRouter(self.summary_triggers, self.qa_trigger, self.URL_PATTERN)
+
         # 自动总结开关
         self.auto_sum = self.config.get("auto_sum", True)
 
@@ -105,34 +248,278 @@ class AutoSummaryOpenAI(PluginBase):
         logger.info(f"用户黑名单: {self.black_user_list}")
         logger.info(f"群组白名单: {self.white_group_list}")
         logger.info(f"群组黑名单: {self.black_group_list}")
+        # 各上游（openai、Jina、网页源站）独立的HTTP连接池，openai的代理默认使用 http-proxy
+        connections = self.config.get("Connections", {})
+        self.connection_warm_up = connections.get("warm_up", True)
+        self.sessions = UpstreamSessions({
+            upstream: PoolConfig.from_dict(upstream, connections.get(upstream, {}),
+                                           proxy=self.http_proxy if upstream == "llm" else "")
+            for upstream in UPSTREAMS
+        })
+
+        # openai端点池，未配置 endpoints 时只包含上面的单个端点
+        self.llm_pool = LLMPool(self._load_pool_members(openai_config),
+                                eject_failures=self.llm_eject_failures, eject_time=self.llm_eject_time)
+
         logger.info(f"OpenAIEnable: {self.openai_enable}")
         logger.info(f"OpenAIAPIKey: {self.openai_api_key}")
         logger.info(f"OpenAIBaseUrl: {self.openai_base_url}")
+        logger.info(f"openai端点池: {[f'{m.name}({m.model}, 权重={m.weight}, 并发={m.max_concurrency})' for m in self.llm_pool.members]}")
 
         # 存储最近的链接和卡片信息
         self.recent_urls = {}  # 格式: {chat_id: {"url": url, "timestamp": timestamp}}
         self.recent_cards = {}  # 格式: {chat_id: {"info": card_info, "timestamp": timestamp}}
 
-        # 存储总结内容缓存
-        self.summary_cache = {}  # 格式: {chat_id: {"summary": summary, "original_content": content, "timestamp": timestamp}}
-
-        self.http_session: Optional[aiohttp.ClientSession] = None
+        # 存储总结内容缓存，每个聊天只保存指向共享条目的引用
+        self.summary_cache = {}  # 格式: {chat_id: {"key": cache_key, "entry": shared_entry, "timestamp": timestamp}}
+
+        # 网页正文存储，按内容哈希去重，下面的缓存只保存哈希
+        self.bodies = BodyStore(max_bytes=self.memory_budget_mb * 1024 * 1024, cold_after=self.body_cold_after)
+
+        # 跨聊天共享的总结缓存，按 (归一化URL, 提示词类型) 存储
+        # 格式: {(url, variant): {"summary": summary, "content_hash": hash, "timestamp": timestamp}}
+        self.shared_summary_cache = LRUCache(max_size=self.summary_cache_size, ttl=self.expiration_time,
+                                             stale_ttl=self.stale_keep_time)
+
+        # 跨聊天共享的网页内容缓存，按归一化URL存储正文的内容哈希和源站的验证信息
+        # 格式: {url: {"content_hash": hash, "url": final_url, "etag": etag, "last_modified": last_modified}}
+        self.content_cache = LRUCache(max_size=self.summary_cache_size, ttl=self.expiration_time,
+                                      stale_ttl=self.stale_keep_time)
+
+        # 抓取失败的链接，按归一化URL存储失败原因和屏蔽截止时间
+        self.failed_urls = NegativeCache(base_ttl=self.failure_cache_time, max_ttl=self.failure_cache_max_time)
+
+        # 追问用的原文片段索引，按内容哈希存储，首次追问时建立；索引比正文大，只保留最近使用的少量
+        self.qa_index_cache = LRUCache(max_size=64, ttl=self.expiration_time)
+
+        # 持久化存储，内存中没有的数据按需从磁盘加载
+        self.store: Optional[PersistentStore] = None
+        if self.persist_enable:
+            self.store = PersistentStore(self.persist_path, ttl=self.expiration_time,
+                                         max_size_mb=self.persist_max_size_mb)
+            logger.info(f"持久化存储: {self.persist_path}, 上限: {self.persist_max_size_mb}MB")
+        # 已从持久化存储加载过状态的聊天，与聊天状态使用相同的上限，淘汰后下次收到消息时重新加载
+        self._loaded_chats = LRUCache(max_size=self.max_chat_states, ttl=0)
+
+        # 最近链接、卡片和总结引用的过期索引，元素为 (类型, chat_id)
+        self._expiry_index = ExpiryIndex()
+
+        # 重定向解析结果缓存，按归一化URL（域名+路径）存储
+        self.redirect_cache = LRUCache(max_size=2048, ttl=86400)
+        # 运行中发现会重定向的域名，之后的链接在抓取前先解析
+        self._learned_redirect_hosts = set()
+
+        # 源站最近返回的 ETag/Last-Modified，按归一化URL存储，保存网页内容时一起保存
+        self._origin_validators = LRUCache(max_size=2048, ttl=self.expiration_time)
+        # 最近已写入持久化存储的原文哈希，避免同一正文重复写入
+        self._persisted_bodies = LRUCache(max_size=4096, ttl=self.expiration_time)
+        # HEAD请求没有返回 ETag/Last-Modified 的域名，过期前不再为它们补充验证信息
+        self._no_validator_hosts = LRUCache(max_size=2048, ttl=self.expiration_time)
+
+        # 已处理的卡片消息 MsgId，避免重复投递时再次总结
+        self._seen_card_msgs = LRUCache(max_size=1024, ttl=self.expiration_time)
+
+        # 抓取方式注册表，按域名统计各方式的成功率和耗时，决定尝试顺序和对冲时机
+        self.fetchers = FetcherRegistry(fail_threshold=self.strategy_fail_threshold,
+                                        explore_rate=self.strategy_explore_rate,
+                                        probe_interval=self.strategy_probe_interval)
+        self.fetchers.register("jina", self._fetch_via_jina, "Jina AI")
+        if can_use_advanced_extraction:
+            self.fetchers.register("extractor", self._fetch_via_extractor, "通用内容提取方法")
+        # 已从持久化存储加载过抓取统计的域名
+        self._strategy_loaded = LRUCache(max_size=2048, ttl=0)
+
+        # openai请求调度器
+        self.llm_scheduler = LLMScheduler(self.llm_max_concurrency, self.llm_max_queue)
+
+        # 上游限流器，openai的限流器在每个端点上
+        self.jina_bucket = TokenBucket(self.jina_rpm)
+        # 预取的带宽预算（KB/分钟）
+        self.prefetch_bucket = TokenBucket(self.prefetch_kb_per_minute)
+
+        # 已预取的链接，按归一化URL存储状态（"pending" 抓取中，"done" 已完成），被使用时删除，
+        # 过期或被挤出仍未被使用的计为浪费的预取
+        self._prefetched = LRUCache(max_size=1024, ttl=self.expiration_time,
+                                    on_evict=lambda key, state: self.prefetch_total.inc(result="wasted"))
+        self._prefetch_active = 0
+
+        # 合并相同URL的并发抓取和相同缓存键的并发总结
+        self._fetch_flight = SingleFlight()
+        self._summary_flight = SingleFlight()
+
+        # 后台任务，保留引用避免被垃圾回收
+        self._background_tasks = set()
+        # 定时清理的执行次数，每10次输出一次内存使用
+        self._sweep_count = 0
+
+        self._init_metrics()
+        self._metrics_runner = None
         
 
-        if not self.openai_enable or not self.openai_api_key or not self.openai_base_url:
+        if not self.openai_enable or not self.llm_pool.members:
             logger.warning("openai配置不完整，自动总结功能将被禁用")
             self.openai_enable = False
+
+    def _load_pool_members(self, openai_config: Dict) -> list:
+        """读取 [[AutoSummaryOpenAI.OpenAI.endpoints]]，未配置时使用单个 base-url/api-key/model
+
+        端点未填写的 model、http-proxy、rpm、tpm 使用外层配置的值。
+        """
+        endpoints = openai_config.get("endpoints") or [{
+            "name": "default",
+            "base-url": self.openai_base_url,
+            "api-key": self.openai_api_key,
+        }]
+        members = []
+        for index, endpoint in enumerate(endpoints):
+            name = endpoint.get("name") or f"endpoint-{index + 1}"
+            base_url = endpoint.get("base-url", "")
+            api_key = endpoint.get("api-key", "")
+            if not base_url or not api_key:
+                logger.warning(f"openai端点 {name} 缺少 base-url 或 api-key，已跳过")
+                continue
+            members.append(PoolMember(
+                name=name,
+                base_url=base_url,
+                api_key=api_key,
+                model=endpoint.get("model", self.model),
+                weight=endpoint.get("weight", 1),
+                max_concurrency=endpoint.get("max_concurrency", self.llm_max_concurrency),
+                http_proxy=endpoint.get("http-proxy", self.sessions.proxy("llm") or ""),
+                rpm=endpoint.get("rpm", self.llm_rpm),
+                tpm=endpoint.get("tpm", self.llm_tpm),
+            ))
+        return members
     
-    async def _get_session(self) -> aiohttp.ClientSession:
-        if self.http_session is None or self.http_session.closed:
-            # 在异步函数里真正创建
-            self.http_session = aiohttp.ClientSession()
-        return self.http_session
+    def _init_metrics(self):
+        """注册各阶段、上游和缓存的指标"""
+        self.metrics = MetricsRegistry(prefix="autosummary_")
+        self.stage_seconds = self.metrics.histogram(
+            "stage_duration_seconds", "各处理阶段耗时（秒）", ("stage", "outcome"))
+        self.stage_total = self.metrics.counter(
+            "stage_total", "各处理阶段执行次数", ("stage", "outcome"))
+        self.upstream_seconds = self.metrics.histogram(
+            "upstream_request_duration_seconds", "上游请求耗时（秒）", ("upstream", "target", "outcome"))
+        self.upstream_total = self.metrics.counter(
+            "upstream_requests_total", "上游请求次数", ("upstream", "target", "outcome"))
+        self.fetcher_total = self.metrics.counter(
+            "fetcher_attempts_total", "各抓取方式的执行次数", ("strategy", "outcome"))
+        self.prefetch_total = self.metrics.counter(
+            "prefetch_total", "预取次数，按结果区分（completed/hit/joined/wasted/failed/skipped_*）", ("result",))
+        self.cache_total = self.metrics.counter(
+            "cache_requests_total", "缓存查询次数", ("cache", "result"))
+        self.delivery_seconds = self.metrics.histogram(
+            "delivery_seconds", "从开始处理到发送总结的耗时（秒）", ("phase",))
+        self.llm_queue_wait_seconds = self.metrics.histogram(
+            "llm_queue_wait_seconds", "openai请求在调度器中排队等待的耗时（秒），按优先级区分", ("priority",))
+        self.metrics.gauge("in_flight", "进行中的任务数", ("kind",), collect=lambda: {
+            ("fetch",): len(self._fetch_flight),
+            ("summary",): len(self._summary_flight),
+            ("llm_active",): self.llm_scheduler.active,
+            ("llm_waiting",): self.llm_scheduler.waiting,
+            ("background",): len(self._background_tasks),
+            ("prefetch",): self._prefetch_active,
+        })
+        self.metrics.gauge("llm_endpoint_outstanding", "各openai端点进行中的请求数", ("endpoint",), collect=lambda: {
+            (m.name,): m.outstanding for m in self.llm_pool.members
+        })
+        self.metrics.gauge("llm_endpoint_ejected", "openai端点是否被摘除", ("endpoint",), collect=lambda: {
+            (m.name,): int(m.is_ejected(time.monotonic())) for m in self.llm_pool.members
+        })
+        self.metrics.gauge("llm_scheduler_dropped", "openai请求因队列已满被拒绝的累计次数", collect=lambda: {
+            (): self.llm_scheduler.dropped
+        })
+        self.metrics.gauge("memory_bytes", "插件状态占用的内存（字节）", ("kind",), collect=lambda: {
+            ("bodies",): self.bodies.total_bytes
+        })
+        self.metrics.gauge("cache_entries", "缓存条目数", ("cache",), collect=lambda: {
+            ("content",): len(self.content_cache),
+            ("summary",): len(self.shared_summary_cache),
+            ("redirect",): len(self.redirect_cache),
+            ("qa_index",): len(self.qa_index_cache),
+            ("failed_urls",): len(self.failed_urls),
+            ("bodies",): len(self.bodies),
+            ("fetch_strategy",): len(self.fetchers),
+        })
+        # 域名标签的取值上限，避免指标数量无限增长
+        self._metric_domains = set()
+
+    def _metric_domain(self, url: str) -> str:
+        domain = urlsplit(url).hostname or ""
+        if domain in self._metric_domains:
+            return domain
+        if len(self._metric_domains) >= 200:
+            return "other"
+        self._metric_domains.add(domain)
+        return domain
+
+    def _record_upstream(self, upstream: str, target: str, outcome: str, elapsed: float):
+        self.upstream_seconds.observe(elapsed, upstream=upstream, target=target, outcome=outcome)
+        self.upstream_total.inc(upstream=upstream, target=target, outcome=outcome)
+
+    async def async_init(self):
+        await self._start_metrics_server()
+        if self.connection_warm_up:
+            # 不阻塞插件加载，预热失败不影响后续请求
+            self._spawn(self._warm_up_connections())
+
+    async def _warm_up_connections(self):
+        """插件加载时预先建立到openai各端点和Jina的连接，第一条消息不再等待DNS解析和TLS握手"""
+        targets = [("jina", self.jina_base_url, None)]
+        if self.openai_enable:
+            targets += [("llm", member.base_url, member.http_proxy or None) for member in self.llm_pool.members]
+        results = await asyncio.gather(*(self.sessions.warm_up(upstream, url, proxy)
+                                         for upstream, url, proxy in targets))
+        logger.info(f"连接预热完成: {sum(results)}/{len(targets)}")
+
+    async def _start_metrics_server(self):
+        """启动本地 /metrics 监听（Prometheus 文本格式）"""
+        if not self.metrics_port or self._metrics_runner is not None:
+            return
+        from aiohttp import web
+
+        async def handle_metrics(request):
+            return web.Response(body=self.metrics.render().encode("utf-8"),
+                                headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.metrics_host, self.metrics_port).start()
+        except OSError as e:
+            logger.error(f"启动指标监听失败: {e}")
+            await runner.cleanup()
+            return
+        self._metrics_runner = runner
+        logger.info(f"指标监听已启动: http://{self.metrics_host}:{self.metrics_port}/metrics")
+
+    async def _get_session(self, upstream: str) -> aiohttp.ClientSession:
+        """获取 upstream（llm、jina、origin）对应的会话，每类上游使用独立的连接池"""
+        return await self.sessions.get(upstream)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """启动后台任务"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
 
     async def close(self):
-        if self.http_session:
-            await self.http_session.close()
-            logger.info("HTTP会话已关闭")
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+            self._metrics_runner = None
+        self._fetch_flight.cancel_all()
+        self._summary_flight.cancel_all()
+        await self.sessions.close()
+        logger.info("HTTP会话已关闭")
+        if self.store:
+            self._flush_strategy_stats()
+            await self.store.close()
+            logger.info("持久化存储已关闭")
 
     def _check_url(self, url: str) -> bool:
         stripped_url = url.strip()
@@ -146,37 +533,216 @@ class AutoSummaryOpenAI(PluginBase):
 
     # 检查是否是总结命令
     def _is_summary_command(self, content: str) -> bool:
-        content = content.strip().lower()
-        # 检查是否以任何触发词开头，支持触发词后有不定数量的空格或没有空格
-        for trigger in self.summary_triggers:
-            # 使用正则表达式匹配触发词开头，后面可以跟任意字符
-            if re.match(f"^{re.escape(trigger)}\\s*.*", content):
-                return True
-        return False
+        return self.router.route(content).kind == "summary"
 
     # 检查是否是追问命令
     def _is_qa_command(self, content: str) -> bool:
-        content = content.strip().lower()
-        # 检查是否以追问触发词开头，支持触发词后有不定数量的空格或没有空格
-        return re.match(f"^{re.escape(self.qa_trigger)}\\s*.*", content) is not None
+        return self.router.route(content).kind == "qa"
+
+    def _summary_cache_key(self, url: str, is_xiaohongshu: bool = False, custom_prompt: str = None) -> tuple:
+        """生成共享总结缓存的键
+
+        GitHub主页的提示词由内容决定，同一URL总是落在同一类型，因此只区分
+        默认、小红书和自定义问题三种情况。
+        """
+        if custom_prompt:
+            variant = f"custom:{custom_prompt.strip()}"
+        elif is_xiaohongshu:
+            variant = "xiaohongshu"
+        else:
+            variant = "default"
+        return normalize_url(url), variant
+
+    def _bind_summary(self, chat_id: str, key: tuple, entry: Dict):
+        """让聊天的总结缓存指向共享条目，供后续追问使用"""
+        self.summary_cache[chat_id] = {
+            "key": key,
+            "entry": entry,
+            "timestamp": time.time()
+        }
+        self._on_chat_state_changed(chat_id, "summary")
+
+    def _is_fresh(self, timestamp: float) -> bool:
+        return time.time() - timestamp <= self.expiration_time
+
+    @staticmethod
+    def _store_key(key: tuple) -> str:
+        return json.dumps(list(key), ensure_ascii=False)
+
+    async def _get_shared_summary(self, key: tuple) -> Optional[Dict]:
+        """查询共享总结缓存，内存中没有时从持久化存储加载"""
+        entry = self.shared_summary_cache.get(key)
+        if entry or not self.store:
+            self.cache_total.inc(cache="summary", result="hit" if entry else "miss")
+            return entry
+        stored = await self.store.get("summary", self._store_key(key))
+        if stored and not self._is_fresh(stored["timestamp"]):
+            # 过期的总结只用于内容未变化时沿用，见 _get_stale_summary
+            stored = None
+        self.cache_total.inc(cache="summary", result="store_hit" if stored else "miss")
+        if not stored:
+            return None
+        self.shared_summary_cache.set(key, stored, timestamp=stored["timestamp"])
+        logger.info(f"从持久化存储加载总结: {key}")
+        return stored
+
+    async def _get_stale_summary(self, key: tuple) -> Optional[Dict]:
+        """查询已过期但仍在保留期内的总结，用于判断内容未变化时沿用"""
+        cached = self.shared_summary_cache.get_stale(key)
+        if cached:
+            return cached[0]
+        if not self.store:
+            return None
+        return await self.store.get("summary", self._store_key(key))
+
+    def _persist_body(self, content: str, timestamp: float) -> str:
+        """按内容哈希把正文写入持久化存储，网页内容和各种总结（默认、小红书、自定义问题）都只引用哈希
+
+        expiration_time 内写入过的正文不再重复写入；正文多保留一个 expiration_time，
+        不会早于这段时间内写入的、引用它的内容和总结过期。
+        """
+        digest = self.bodies.digest(content)
+        if self._persisted_bodies.get(digest) is None:
+            self._persisted_bodies.set(digest, True)
+            self.store.put("body", digest, {"content": content}, timestamp=timestamp,
+                           ttl=2 * self.expiration_time + self.stale_keep_time)
+        return digest
+
+    async def _load_body(self, content_hash: str) -> Optional[str]:
+        """按内容哈希取出正文，内存中已被淘汰时从持久化存储加载"""
+        content = self.bodies.get(content_hash)
+        if content is None and self.store:
+            stored = await self.store.get("body", content_hash)
+            if stored:
+                content = stored["content"]
+                self.bodies.put(content)
+        return content
+
+    def _chat_state_source(self, kind: str) -> Dict:
+        return {"url": self.recent_urls, "card": self.recent_cards, "summary": self.summary_cache}[kind]
+
+    def _on_chat_state_changed(self, chat_id: str, kind: str):
+        """聊天的最近链接、卡片或总结引用变化后，登记过期时间并写入持久化存储"""
+        source = self._chat_state_source(kind)
+        item = source.get(chat_id)
+        if item is not None:
+            self._expiry_index.schedule((kind, chat_id), item["timestamp"] + self.expiration_time)
+            # 移到末尾，超出上限时从最久未变化的聊天开始淘汰
+            source[chat_id] = source.pop(chat_id)
+            while len(source) > self.max_chat_states:
+                evicted = next(iter(source))
+                del source[evicted]
+                # 持久化存储中仍保留该聊天的状态，下次收到消息时重新加载
+                self._loaded_chats.pop(evicted)
+        self._persist_chat_state(chat_id, kind)
+
+    def _persist_chat_state(self, chat_id: str, kind: str):
+        """把聊天的最近链接、卡片或总结引用写入持久化存储，不存在时删除"""
+        if not self.store:
+            return
+        store_key = f"{kind}:{chat_id}"
+        item = self._chat_state_source(kind).get(chat_id)
+        if item is None:
+            self.store.delete("chat", store_key)
+            return
+        if kind == "summary":
+            # 总结正文单独存储，这里只保存缓存键
+            item = {"key": list(item["key"]), "timestamp": item["timestamp"]}
+        self.store.put("chat", store_key, item, timestamp=item["timestamp"])
+
+    async def _load_chat_state(self, chat_id: str):
+        """首次收到某个聊天的消息时，从持久化存储恢复它的状态"""
+        if not self.store or chat_id in self._loaded_chats:
+            return
+        self._loaded_chats.set(chat_id, True)
+
+        if chat_id not in self.recent_urls:
+            item = await self.store.get("chat", f"url:{chat_id}")
+            if item:
+                self.recent_urls[chat_id] = item
+                self._expiry_index.schedule(("url", chat_id), item["timestamp"] + self.expiration_time)
+        if chat_id not in self.recent_cards:
+            item = await self.store.get("chat", f"card:{chat_id}")
+            if item:
+                self.recent_cards[chat_id] = item
+                self._expiry_index.schedule(("card", chat_id), item["timestamp"] + self.expiration_time)
+        if chat_id not in self.summary_cache:
+            item = await self.store.get("chat", f"summary:{chat_id}")
+            if item:
+                key = tuple(item["key"])
+                entry = await self._get_shared_summary(key)
+                if entry:
+                    self.summary_cache[chat_id] = {"key": key, "entry": entry, "timestamp": item["timestamp"]}
+                    self._expiry_index.schedule(("summary", chat_id), item["timestamp"] + self.expiration_time)
+        logger.debug(f"已从持久化存储恢复聊天状态: {chat_id}")
 
     # 清理过期的链接、卡片和总结缓存
     def _clean_expired_items(self):
+        """只处理已经到期的条目，不遍历全部聊天"""
         current_time = time.time()
-        # 清理过期的URL
-        for chat_id in list(self.recent_urls.keys()):
-            if current_time - self.recent_urls[chat_id]["timestamp"] > self.expiration_time:
-                del self.recent_urls[chat_id]
-
-        # 清理过期的卡片
-        for chat_id in list(self.recent_cards.keys()):
-            if current_time - self.recent_cards[chat_id]["timestamp"] > self.expiration_time:
-                del self.recent_cards[chat_id]
-
-        # 清理过期的总结缓存
-        for chat_id in list(self.summary_cache.keys()):
-            if current_time - self.summary_cache[chat_id]["timestamp"] > self.expiration_time:
-                del self.summary_cache[chat_id]
+        for kind, chat_id in self._expiry_index.pop_due(current_time):
+            source = self._chat_state_source(kind)
+            item = source.get(chat_id)
+            # 时间戳被更新过的条目在索引中还有更晚的到期时间，这里跳过
+            if item is not None and item["timestamp"] + self.expiration_time < current_time:
+                del source[chat_id]
+
+    def _memory_report(self) -> Dict:
+        """插件状态的内存使用情况"""
+        body_stats = self.bodies.stats()
+        report = {
+            "body_mb": round(body_stats["bytes"] / 1024 / 1024, 2),
+            "body_budget_mb": self.memory_budget_mb,
+            "bodies": body_stats["bodies"],
+            "compressed": body_stats["compressed"],
+            "body_evictions": body_stats["evictions"],
+            "dedup_hits": body_stats["dedup_hits"],
+            "summaries": len(self.shared_summary_cache),
+            "qa_indexes": len(self.qa_index_cache),
+            "recent_urls": len(self.recent_urls),
+            "recent_cards": len(self.recent_cards),
+            "chat_summaries": len(self.summary_cache),
+        }
+        try:
+            # Linux 下读取当前进程的常驻内存
+            with open("/proc/self/statm") as f:
+                report["rss_mb"] = round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+        except (OSError, ValueError, AttributeError):
+            pass
+        return report
+
+    @schedule('interval', seconds=60)
+    async def sweep_expired_items(self, bot: 'WechatAPIClient'):
+        """后台定时清理过期数据，消息处理路径只做少量工作"""
+        self._clean_expired_items()
+        purged = self.shared_summary_cache.purge_expired() + self.content_cache.purge_expired() + \
+            self.qa_index_cache.purge_expired() + self.failed_urls.purge_expired()
+        if purged:
+            logger.debug(f"已清理 {purged} 条过期的共享缓存")
+        wasted = self._prefetched.purge_expired()
+        if wasted:
+            self.prefetch_total.inc(wasted, result="wasted")
+        compressed = self.bodies.compress_cold()
+        if compressed:
+            logger.debug(f"已压缩 {compressed} 篇闲置正文")
+        self._sweep_count += 1
+        if self._sweep_count % 10 == 0:
+            logger.info(f"内存使用: {self._memory_report()}")
+            if self.prefetch_enable:
+                logger.info(f"预取统计: {self._prefetch_stats()}")
+        if self.metrics_file:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.metrics.write_file, self.metrics_file)
+            except OSError as e:
+                logger.error(f"写入指标文件失败: {e}")
+        if self.store:
+            self._flush_strategy_stats()
+            await self.store.maintain()
+        scheduler_stats = self.llm_scheduler.stats()
+        if scheduler_stats["active"] or scheduler_stats["waiting"]:
+            logger.info(f"openai请求调度状态: {scheduler_stats}")
+        if len(self.llm_pool.members) > 1:
+            logger.debug(f"openai端点池状态: {self.llm_pool.stats()}")
 
     # 检查是否应该自动总结
     def _should_auto_summarize(self, chat_id: str, is_group: bool, sender_id: str = None) -> bool:
@@ -243,127 +809,574 @@ class AutoSummaryOpenAI(PluginBase):
         logger.info(f"{'群组' if is_group else '用户'} {chat_id} 不在黑名单中，将自动总结")
         return True
 
-    async def _fetch_url_content(self, url: str) -> Optional[str]:
+    @instrument_stage("fetch")
+    async def _fetch_url_content(self, url: str, prefetch: bool = False) -> Optional[str]:
+        """获取URL内容，优先使用缓存，同一URL的并发请求共享一次抓取
+
+        prefetch 为 True 表示后台预取，不计入预取的命中统计。
+        """
+        key = normalize_url(url)
+        state = None if prefetch else self._prefetched.pop(key)
+        record = self.content_cache.get(key)
+        content = self.bodies.get(record["content_hash"]) if record else None
+        if state == "done":
+            # 预取的正文已被淘汰时需要重新抓取，计为浪费的预取
+            self.prefetch_total.inc(result="hit" if content else "wasted")
+        elif state:
+            # 仍在抓取中时等待预取的结果
+            self.prefetch_total.inc(result="joined")
+        if content:
+            logger.info(f"命中网页内容缓存: {url}")
+            self.cache_total.inc(cache="content", result="hit")
+            return content
+        if self._fetch_flight.in_flight(key):
+            logger.info(f"URL正在抓取中，等待已有请求: {url}")
+            self.cache_total.inc(cache="content", result="coalesced")
+        return await self._fetch_flight.do(key, lambda: self._load_or_fetch_content(key, url, prefetch))
+
+    def _schedule_prefetch(self, url: str):
+        """在后台预先抓取链接的正文，之后的总结命令只需要调用openai
+
+        已有总结或正文、最近抓取失败、正在抓取、并发已满时跳过；带宽预算用完或 Jina 剩余额度
+        不足 prefetch_jina_reserve 时放弃本次预取。预取失败不记入抓取失败的屏蔽记录。
+        """
+        key = normalize_url(url)
+        if key in self._prefetched or self._fetch_flight.in_flight(key) or self.failed_urls.get(key) \
+                or self.content_cache.get(key) is not None \
+                or self.shared_summary_cache.get(self._summary_cache_key(url)) is not None:
+            self.prefetch_total.inc(result="skipped_cached")
+            return
+        if self._prefetch_active >= self.prefetch_concurrency:
+            self.prefetch_total.inc(result="skipped_busy")
+            logger.debug(f"预取并发已满，跳过: {url}")
+            return
+        self._prefetch_active += 1
+        self._prefetched.set(key, "pending")
+        self._spawn(self._prefetch(url, key))
+
+    async def _prefetch(self, url: str, key: str):
+        try:
+            if not await self.prefetch_bucket.acquire(1, deadline=time.monotonic()):
+                self.prefetch_total.inc(result="skipped_budget")
+                logger.debug(f"预取带宽预算已用完，跳过: {url}")
+                self._prefetched.pop(key)
+                return
+            if self.jina_bucket.enabled and self.jina_bucket.available() < self.prefetch_jina_reserve:
+                self.prefetch_total.inc(result="skipped_jina")
+                logger.debug(f"Jina 剩余额度不足，留给总结命令，跳过预取: {url}")
+                self._prefetched.pop(key)
+                return
+            logger.info(f"预取链接内容: {url}")
+            content = await self._fetch_url_content(url, prefetch=True)
+            if not content:
+                self.prefetch_total.inc(result="failed")
+                self._prefetched.pop(key)
+                return
+            # 按提取后的正文大小计入带宽预算
+            self.prefetch_bucket.charge(len(content.encode("utf-8")) / 1024)
+            self.prefetch_total.inc(result="completed")
+            # 预取期间已被总结命令使用时不再标记
+            if self._prefetched.get(key) == "pending":
+                self._prefetched.set(key, "done")
+        finally:
+            self._prefetch_active -= 1
+
+    def _prefetch_stats(self) -> Dict:
+        """预取的命中率（被总结命令使用的比例）和浪费率（过期、被挤出或正文被淘汰的比例）"""
+        completed = self.prefetch_total.value(result="completed")
+        used = self.prefetch_total.value(result="hit") + self.prefetch_total.value(result="joined")
+        wasted = self.prefetch_total.value(result="wasted")
+        return {
+            "completed": completed,
+            "used": used,
+            "wasted": wasted,
+            "hit_rate": round(used / completed, 3) if completed else None,
+            "wasted_rate": round(wasted / completed, 3) if completed else None,
+            "active": self._prefetch_active,
+        }
+
+    async def _load_or_fetch_content(self, key: str, url: str, prefetch: bool = False) -> Optional[str]:
+        """依次使用持久化存储、条件请求验证过期内容、重新抓取；重新抓取失败时沿用过期内容"""
+        stale = self._get_stale_content(key)
+        if stale is None and self.store:
+            stored = await self._load_stored_content(key)
+            if stored and self._is_fresh(stored["timestamp"]):
+                logger.info(f"从持久化存储加载网页内容: {url}")
+                self.cache_total.inc(cache="content", result="store_hit")
+                self.content_cache.set(key, self._content_record(stored["content"], stored),
+                                       timestamp=stored["timestamp"])
+                return stored["content"]
+            stale = stored if self.revalidate_enable else None
+        elif stale is not None and self._is_fresh(stale["timestamp"]):
+            # 等待期间其他请求已经写入了缓存
+            return stale["content"]
+
+        failure = self.failed_urls.get(key)
+        if failure:
+            # 最近抓取失败过，屏蔽期内不再等待抓取超时
+            self.cache_total.inc(cache="failed_url", result="hit")
+            if stale:
+                return stale["content"]
+            logger.info(f"链接最近抓取失败（{failure['reason']}），"
+                        f"{failure['until'] - time.time():.0f}秒内不再重试: {url}")
+            return None
+
+        if stale and (stale.get("etag") or stale.get("last_modified")):
+            if await self._revalidate_content(stale):
+                logger.info(f"网页未修改，继续使用已有内容: {url}")
+                self.cache_total.inc(cache="content", result="revalidated")
+                self._save_content(key, stale["content"], stale)
+                return stale["content"]
+
+        self.cache_total.inc(cache="content", result="miss")
+        content = await self._do_fetch_url_content(url, prefetch)
+        if content:
+            self.failed_urls.discard(key)
+            meta = self._fetched_validators(key, url)
+            self._save_content(key, content, meta)
+            if self.revalidate_enable and not (meta["etag"] or meta["last_modified"]):
+                # Jina 抓取不经过源站，拿不到验证信息，后台向源站补一次HEAD请求
+                self._spawn(self._capture_validators(key, meta["url"]))
+        elif stale:
+            logger.warning(f"重新抓取失败，继续使用过期的网页内容: {url}")
+            return stale["content"]
+        return content
+
+    def _remember_fetch_failure(self, url: str, reason: str, prefetch: bool = False):
+        if prefetch:
+            # 预取失败不屏蔽链接，之后的总结命令仍然重新抓取
+            logger.debug(f"预取失败: {url}, 原因: {reason}")
+            return
+        entry = self.failed_urls.add(normalize_url(url), reason)
+        logger.info(f"记录抓取失败的链接: {url}, 原因: {reason}, 第{entry['failures']}次, "
+                    f"{entry['until'] - time.time():.0f}秒内直接回复失败")
+
+    def _fetch_failure_message(self, url: str, default: str) -> str:
+        """链接在抓取失败的屏蔽期内时回复失败原因，否则回复 default"""
+        failure = self.failed_urls.get(normalize_url(url))
+        if not failure:
+            return default
+        return f"❌ 抱歉，无法获取链接内容：{failure['reason']}，请稍后再试"
+
+    def _get_stale_content(self, key: str) -> Optional[Dict]:
+        """从内存中取出已过期但仍在保留期内的网页内容，格式与持久化存储中的相同"""
+        if not self.revalidate_enable:
+            return None
+        cached = self.content_cache.get_stale(key)
+        if not cached:
+            return None
+        record, timestamp = cached
+        content = self.bodies.get(record["content_hash"])
+        if content is None:
+            return None
+        return dict(record, content=content, timestamp=timestamp)
+
+    def _content_record(self, content: str, meta: Dict) -> Dict:
+        return {
+            "content_hash": self.bodies.put(content),
+            "url": meta.get("url"),
+            "etag": meta.get("etag"),
+            "last_modified": meta.get("last_modified"),
+        }
+
+    def _save_content(self, key: str, content: str, meta: Dict):
+        """写入网页内容缓存和持久化存储，meta 中包含最终URL和源站的 ETag/Last-Modified"""
+        now = time.time()
+        record = self._content_record(content, meta)
+        self.content_cache.set(key, record, timestamp=now)
+        if self.store:
+            self._persist_body(content, now)
+            self._store_content(key, record, now)
+
+    async def _load_stored_content(self, key: str) -> Optional[Dict]:
+        """从持久化存储读取网页内容，正文已被淘汰时视为没有"""
+        stored = await self.store.get("content", key)
+        if not stored:
+            return None
+        content = await self._load_body(stored["content_hash"])
+        if content is None:
+            return None
+        return dict(stored, content=content)
+
+    def _store_content(self, key: str, record: Dict, timestamp: float):
+        """持久化网页内容的元数据，正文由 _persist_body 单独保存，通过 content_hash 引用"""
+        stored = {
+            "content_hash": record["content_hash"],
+            "url": record["url"],
+            "etag": record["etag"],
+            "last_modified": record["last_modified"],
+            "timestamp": timestamp
+        }
+        self.store.put("content", key, stored, timestamp=timestamp, ttl=self.expiration_time + self.stale_keep_time)
+
+    def _remember_validators(self, url: str, headers):
+        """记录源站返回的 ETag/Last-Modified，供之后的条件请求使用"""
+        if not self.revalidate_enable:
+            return
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag or last_modified:
+            self._origin_validators.set(normalize_url(url), {"etag": etag, "last_modified": last_modified})
+
+    def _fetched_validators(self, key: str, url: str) -> Dict:
+        """抓取完成后，取出本次抓取过程中（通用提取方法或重定向检查）记录的验证信息"""
+        final_url = self.redirect_cache.get(key) or url
+        validators = self._origin_validators.get(normalize_url(final_url)) or self._origin_validators.get(key) or {}
+        return {"url": final_url, "etag": validators.get("etag"), "last_modified": validators.get("last_modified")}
+
+    async def _capture_validators(self, key: str, url: str):
+        """向源站发送HEAD请求，为没有验证信息的内容（Jina 抓取的）补充 ETag/Last-Modified
+
+        源站不返回验证信息的域名（例如微信文章）在 expiration_time 内不再发送，这些内容过期后
+        只能重新抓取，再按内容哈希判断是否可以沿用已有总结。
+        """
+        host = urlsplit(url).hostname or ""
+        if not host or self._no_validator_hosts.get(host):
+            return
+        headers = None
+        start_time = time.monotonic()
+        outcome = "error"
+        try:
+            session = await self._get_session("origin")
+            timeout = aiohttp.ClientTimeout(total=self.redirect_timeout)
+            async with session.head(url, headers=self._get_default_headers(), allow_redirects=True,
+                                    proxy=self.sessions.proxy("origin"), timeout=timeout) as response:
+                outcome = "ok" if response.status == 200 else f"http_{response.status}"
+                if response.status == 200:
+                    headers = response.headers
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"获取验证信息失败: {e}, URL: {url}")
+        self._record_upstream("validators", self._metric_domain(url), outcome, time.monotonic() - start_time)
+        if headers is None:
+            return
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not (etag or last_modified):
+            logger.debug(f"{host} 不返回 ETag/Last-Modified，过期后只能重新抓取")
+            self._no_validator_hosts.set(host, True)
+            return
+        cached = self.content_cache.get_stale(key)
+        if not cached or cached[0].get("url") != url:
+            # 等待期间内容已被替换
+            return
+        record, timestamp = cached
+        record["etag"], record["last_modified"] = etag, last_modified
+        if self.store:
+            self._store_content(key, record, timestamp)
+
+    async def _revalidate_content(self, stale: Dict) -> bool:
+        """向源站发送条件请求，返回304时说明内容未变化；其他结果按正常流程重新抓取"""
+        url = stale.get("url")
+        if not url:
+            return False
+        headers = self._get_default_headers()
+        headers.pop("Cache-Control", None)
+        if stale.get("etag"):
+            headers["If-None-Match"] = stale["etag"]
+        if stale.get("last_modified"):
+            headers["If-Modified-Since"] = stale["last_modified"]
+        start_time = time.monotonic()
+        outcome = "error"
+        try:
+            session = await self._get_session("origin")
+            timeout = aiohttp.ClientTimeout(total=self.redirect_timeout)
+            async with session.get(url, headers=headers, proxy=self.sessions.proxy("origin"),
+                                   timeout=timeout) as response:
+                # 不读取响应体，内容有变化时交给 Jina 和通用提取方法重新抓取
+                outcome = "not_modified" if response.status == 304 else f"http_{response.status}"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"条件请求失败: {e}, URL: {url}")
+        self._record_upstream("revalidate", self._metric_domain(url), outcome, time.monotonic() - start_time)
+        return outcome == "not_modified"
+
+    async def _probe_redirect(self, url: str) -> str:
+        """发送HEAD请求检查重定向，结果写入缓存；失败时返回原始URL"""
+        key = normalize_url(url)
+        final_url = url
+        start_time = time.monotonic()
+        outcome = "error"
+        try:
+            session = await self._get_session("origin")
+            headers = {
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
+            }
+            timeout = aiohttp.ClientTimeout(total=self.redirect_timeout)
+            async with session.head(url, headers=headers, allow_redirects=True, proxy=self.sessions.proxy("origin"),
+                                    timeout=timeout) as head_response:
+                outcome = "ok" if head_response.status == 200 else f"http_{head_response.status}"
+                if head_response.status == 200:
+                    final_url = str(head_response.url)
+                    self._remember_validators(url, head_response.headers)
+        except Exception as e:
+            # 不支持HEAD或超时的链接同样缓存，避免下次再等待
+            logger.warning(f"检查重定向失败: {e}, 使用原始URL")
+        self._record_upstream("redirect", self._metric_domain(url), outcome, time.monotonic() - start_time)
+
+        self.redirect_cache.set(key, final_url)
+        if final_url != url:
+            logger.info(f"检测到重定向: {url} -> {final_url}")
+            host = urlsplit(url).hostname or ""
+            if host and host not in self._learned_redirect_hosts:
+                self._learned_redirect_hosts.add(host)
+                logger.info(f"记录会重定向的域名: {host}")
+        return final_url
+
+    async def _resolve_final_url(self, url: str) -> str:
+        """获取重定向后的最终URL
+
+        - 已知不会重定向的域名直接返回原始URL
+        - 有缓存时直接使用缓存结果
+        - 短链接域名（配置的和运行中发现的）同步解析，需要最终URL判断是否为微信文章
+        - 其他域名不在关键路径上等待，后台解析并记录结果供下次使用，Jina 本身会跟随重定向
+        """
+        host = urlsplit(url).hostname or ""
+        if host in self.no_redirect_hosts:
+            return url
+
+        cached = self.redirect_cache.get(normalize_url(url))
+        self.cache_total.inc(cache="redirect", result="hit" if cached else "miss")
+        if cached:
+            if cached != url:
+                logger.info(f"使用缓存的重定向结果: {url} -> {cached}")
+            return cached
+
+        if host in self.short_link_hosts or host in self._learned_redirect_hosts:
+            return await self._probe_redirect(url)
+
+        self._spawn(self._probe_redirect(url))
+        return url
+
+    async def _fetch_via_jina(self, final_url: str) -> Optional[str]:
+        """使用 Jina AI 获取内容，内容不合格时返回 None"""
+        logger.info(f"使用 Jina AI 获取内容: {final_url}")
+        start_time = time.time()
         try:
-            session = await self._get_session()
+            session = await self._get_session("jina")
             headers = {
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36"
             }
-            # 不在顶层设置超时参数
+            # 检查是否是微信文章URL
+            if "mp.weixin.qq.com" in final_url:
+                # 对微信URL进行完全编码处理
+                encoded_url = quote(final_url, safe='')
+                logger.info(f"检测到微信文章，使用完全编码URL: {encoded_url}")
+                jina_url = f"{self.jina_base_url}/{encoded_url}"
+            else:
+                jina_url = f"{self.jina_base_url}/{final_url}"
+
+            # 限流等待和重试都在30秒的截止时间内完成
+            deadline = time.monotonic() + 30
+            content = None
+            for attempt in range(self.jina_max_retries + 1):
+                if not await self.jina_bucket.acquire(1, deadline):
+                    logger.warning(f"Jina AI 限流等待超过截止时间: {final_url}")
+                    break
+                timeout = aiohttp.ClientTimeout(total=max(deadline - time.monotonic(), 1))
+                async with session.get(jina_url, headers=headers, proxy=self.sessions.proxy("jina"),
+                                       timeout=timeout) as jina_response:
+                    if jina_response.status == 200:
+                        content, truncated = await read_text_capped(jina_response, self.max_download_bytes)
+                        if truncated:
+                            logger.warning(f"Jina AI 返回内容超过下载上限 {self.max_download_bytes} 字节，已截断: {final_url}")
+                        break
+                    status = jina_response.status
+                    retry_after = parse_retry_after(jina_response.headers.get("Retry-After"))
+                if status == 429 or status >= 500:
+                    delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                    if status == 429:
+                        # Jina 已限流，暂停所有 Jina 请求
+                        self.jina_bucket.pause(delay)
+                    if attempt < self.jina_max_retries and time.monotonic() + delay < deadline:
+                        logger.warning(f"Jina AI 返回 {status}, {delay:.1f}秒后重试: {final_url}")
+                        await asyncio.sleep(delay)
+                        continue
+                logger.warning(f"Jina AI 返回状态码 {status}: {final_url}")
+                break
+        except asyncio.CancelledError:
+            self._record_upstream("jina", self._metric_domain(final_url), "cancelled", time.time() - start_time)
+            raise
+        except Exception as e:
+            self._record_upstream("jina", self._metric_domain(final_url), "error", time.time() - start_time)
+            logger.error(f"使用Jina AI获取内容失败: {e}")
+            return None
+        elapsed = time.time() - start_time
+
+        # 区分微信平台和非微信平台的判断标准
+        outcome = "empty"
+        if "mp.weixin.qq.com" in final_url:
+            # 微信平台文章：检查内容是否为空和是否包含"环境异常"字段
+            if content and "环境异常" not in content:
+                logger.info(f"从 Jina AI 获取微信文章内容成功: {jina_url}, 内容长度: {len(content)}")
+                outcome = "ok"
+            elif not content:
+                logger.error(f"从 Jina AI 获取微信文章内容失败，返回为空，URL: {jina_url}")
+            else:
+                logger.error(f"从 Jina AI 获取微信文章内容包含'环境异常'，URL: {jina_url}")
+                outcome = "rejected"
+        else:
+            # 非微信平台文章：只检查内容是否为空
+            if content:
+                logger.info(f"从 Jina AI 获取内容成功: {jina_url}, 内容长度: {len(content)}")
+                outcome = "ok"
+            else:
+                logger.error(f"从 Jina AI 获取内容失败，返回为空，URL: {jina_url}")
+        self._record_upstream("jina", self._metric_domain(final_url), outcome, elapsed)
+        return content if outcome == "ok" else None
+
+    async def _fetch_via_extractor(self, final_url: str) -> Optional[str]:
+        """使用通用内容提取方法获取内容，内容不合格时返回 None"""
+        if not can_use_advanced_extraction:
+            logger.warning("BeautifulSoup库未安装，无法使用高级内容提取方法")
+            if not has_requests_html:
+                logger.warning("requests_html库未安装，动态内容提取功能不可用")
+            return None
 
-            # 先检查是否有重定向，获取最终URL
-            final_url = url
-            try:
-                # 只发送HEAD请求来检查重定向，不获取实际内容
-                async def check_redirect():
-                    # 在任务中设置超时
-                    timeout = aiohttp.ClientTimeout(total=30)
-                    async with session.head(url, headers=headers, allow_redirects=True, timeout=timeout) as head_response:
-                        if head_response.status == 200:
-                            return str(head_response.url)
-                        return url
-
-                final_url = await asyncio.create_task(check_redirect())
-                if final_url != url:
-                    logger.info(f"检测到重定向: {url} -> {final_url}")
-            except Exception as e:
-                logger.warning(f"检查重定向失败: {e}, 使用原始URL")
-                final_url = url
-
-            # 使用 Jina AI 获取内容（使用最终URL）
-            logger.info(f"使用 Jina AI 获取内容: {final_url}")
-            try:
-                # 检查是否是微信文章URL
-                if "mp.weixin.qq.com" in final_url:
-                    # 对微信URL进行完全编码处理
-                    encoded_url = quote(final_url, safe='')
-                    logger.info(f"检测到微信文章，使用完全编码URL: {encoded_url}")
-                    jina_url = f"https://r.jina.ai/{encoded_url}"
+        logger.info(f"尝试使用通用内容提取方法: {final_url}")
+        try:
+            # 使用通用内容提取方法（JinaSum插件的第四种方法）
+            content = await self._extract_content_general(final_url)
+
+            # 区分微信平台和非微信平台的判断标准
+            if "mp.weixin.qq.com" in final_url:
+                # 微信平台文章：检查内容是否足够长且不包含"环境异常"字段
+                if content and len(content) > 50 and "环境异常" not in content:
+                    logger.info(f"通用内容提取方法成功获取微信文章: {final_url}, 内容长度: {len(content)}")
+                    return content
+                if not content or len(content) <= 50:
+                    logger.warning(f"通用内容提取方法获取的微信文章内容过短或为空: {final_url}")
                 else:
-                    jina_url = f"https://r.jina.ai/{final_url}"
-
-                async def get_jina_content():
-                    # 在任务中设置超时
-                    timeout = aiohttp.ClientTimeout(total=30)
-                    async with session.get(jina_url, headers=headers, timeout=timeout) as jina_response:
-                        if jina_response.status == 200:
-                            content = await jina_response.text()
-                            return content
-                        return None
-
-                content = await asyncio.create_task(get_jina_content())
-
-                # 区分微信平台和非微信平台的判断标准
-                if "mp.weixin.qq.com" in final_url:
-                    # 微信平台文章：检查内容是否为空和是否包含"环境异常"字段
-                    if content and "环境异常" not in content:
-                        logger.info(f"从 Jina AI 获取微信文章内容成功: {jina_url}, 内容长度: {len(content)}")
+                    logger.warning(f"通用内容提取方法获取的微信文章内容包含'环境异常': {final_url}")
+            else:
+                # 非微信平台文章：只检查内容是否足够长
+                if content and len(content) > 50:
+                    logger.info(f"通用内容提取方法成功: {final_url}, 内容长度: {len(content)}")
+                    return content
+                logger.warning(f"通用内容提取方法获取的内容过短或为空: {final_url}")
+        except Exception as e:
+            logger.error(f"使用通用内容提取方法失败: {e}")
+        return None
+
+    async def _load_strategy_stats(self, domain: str):
+        """首次抓取某个域名时，从持久化存储加载各抓取方式的统计"""
+        if not self.store or domain in self._strategy_loaded:
+            return
+        self._strategy_loaded.set(domain, True)
+        stored = await self.store.get("strategy", domain)
+        if stored:
+            self.fetchers.restore(domain, stored)
+
+    def _flush_strategy_stats(self):
+        """把有变化的抓取统计写入持久化存储"""
+        if not self.store:
+            return
+        for domain, data in self.fetchers.pop_dirty().items():
+            self.store.put("strategy", domain, data, ttl=self.strategy_stats_ttl)
+
+    async def _run_fetcher(self, name: str, final_url: str, domain: str) -> Optional[str]:
+        """执行一种抓取方式并记录结果"""
+        start_time = time.monotonic()
+        try:
+            content = await self.fetchers.get(name)(final_url)
+        except asyncio.CancelledError:
+            # 对冲中被另一种方式抢先时取消，只记录耗时的下限
+            self.fetchers.record(domain, name, None, time.monotonic() - start_time)
+            self.fetcher_total.inc(strategy=name, outcome="cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"{self.fetchers.label(name)}抓取失败: {e}")
+            content = None
+        self.fetchers.record(domain, name, bool(content), time.monotonic() - start_time)
+        self.fetcher_total.inc(strategy=name, outcome="ok" if content else "failed")
+        return content
+
+    async def _sequential_fetch(self, final_url: str, domain: str, order: list) -> Optional[str]:
+        for index, name in enumerate(order):
+            if index:
+                logger.info(f"{self.fetchers.label(order[index - 1])}失败，尝试使用{self.fetchers.label(name)}: {final_url}")
+            content = await self._run_fetcher(name, final_url, domain)
+            if content:
+                return content
+        return None
+
+    async def _hedged_fetch(self, final_url: str, domain: str, order: list) -> Optional[str]:
+        """对冲抓取：首选方式在 hedge_delay 秒内没有返回时，并行启动排在第二的方式
+
+        该域名首选方式最近耗时的 p95 超过 hedge_delay 时两者同时启动。
+        采用第一个通过质量检查的结果，并取消另一个；两者都失败时依次尝试剩余的方式。
+        """
+        primary, secondary, rest = order[0], order[1], order[2:]
+        delay = self.hedge_delay
+        p95 = self.fetchers.latency_p95(domain, primary)
+        if p95 is not None and p95 > self.hedge_delay:
+            logger.info(f"该域名{self.fetchers.label(primary)}耗时 p95={p95:.1f}秒，同时启动{self.fetchers.label(secondary)}")
+            delay = 0
+
+        primary_task = asyncio.create_task(self._run_fetcher(primary, final_url, domain))
+        pending = {primary_task}
+        try:
+            if delay > 0:
+                done, pending = await asyncio.wait(pending, timeout=delay)
+                if primary_task in done:
+                    content = primary_task.result()
+                    if content:
                         return content
-                    else:
-                        if not content:
-                            logger.error(f"从 Jina AI 获取微信文章内容失败，返回为空，URL: {jina_url}")
-                        elif "环境异常" in content:
-                            logger.error(f"从 Jina AI 获取微信文章内容包含'环境异常'，URL: {jina_url}")
-                        else:
-                            logger.error(f"从 Jina AI 获取微信文章内容失败，未知原因，URL: {jina_url}")
-                else:
-                    # 非微信平台文章：只检查内容是否为空
+                    logger.info(f"{self.fetchers.label(primary)}失败，尝试使用{self.fetchers.label(secondary)}: {final_url}")
+                    return await self._sequential_fetch(final_url, domain, order[1:])
+                logger.info(f"{self.fetchers.label(primary)}在 {delay} 秒内未返回，"
+                            f"并行启动{self.fetchers.label(secondary)}: {final_url}")
+
+            secondary_task = asyncio.create_task(self._run_fetcher(secondary, final_url, domain))
+            pending.add(secondary_task)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    content = task.result()
                     if content:
-                        logger.info(f"从 Jina AI 获取内容成功: {jina_url}, 内容长度: {len(content)}")
+                        winner = primary if task is primary_task else secondary
+                        logger.info(f"对冲抓取由{self.fetchers.label(winner)}胜出: {final_url}")
                         return content
-                    else:
-                        logger.error(f"从 Jina AI 获取内容失败，返回为空，URL: {jina_url}")
-            except Exception as e:
-                logger.error(f"使用Jina AI获取内容失败: {e}")
-
-            # 如果 Jina AI 失败，尝试使用通用内容提取方法
-            logger.info(f"Jina AI 失败，尝试使用通用内容提取方法: {final_url}")
-            if can_use_advanced_extraction:
-                try:
-                    # 使用通用内容提取方法（JinaSum插件的第四种方法）
-                    content = await asyncio.get_event_loop().run_in_executor(None, lambda: self._extract_content_general(final_url))
-
-                    # 区分微信平台和非微信平台的判断标准
-                    if "mp.weixin.qq.com" in final_url:
-                        # 微信平台文章：检查内容是否足够长且不包含"环境异常"字段
-                        if content and len(content) > 50 and "环境异常" not in content:
-                            logger.info(f"通用内容提取方法成功获取微信文章: {final_url}, 内容长度: {len(content)}")
-                            return content
-                        else:
-                            if not content or len(content) <= 50:
-                                logger.warning(f"通用内容提取方法获取的微信文章内容过短或为空: {final_url}")
-                            elif "环境异常" in content:
-                                logger.warning(f"通用内容提取方法获取的微信文章内容包含'环境异常': {final_url}")
-                    else:
-                        # 非微信平台文章：只检查内容是否足够长
-                        if content and len(content) > 50:
-                            logger.info(f"通用内容提取方法成功: {final_url}, 内容长度: {len(content)}")
-                            return content
-                        else:
-                            logger.warning(f"通用内容提取方法获取的内容过短或为空: {final_url}")
-                except Exception as e:
-                    logger.error(f"使用通用内容提取方法失败: {e}")
-
-                # 动态内容提取方法已移除
-                logger.warning(f"通用内容提取方法失败，无法获取内容: {final_url}")
+            return await self._sequential_fetch(final_url, domain, rest)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _do_fetch_url_content(self, url: str, prefetch: bool = False) -> Optional[str]:
+        if has_binary_extension(url):
+            logger.warning(f"链接不是网页，跳过抓取: {url}")
+            self._remember_fetch_failure(url, "链接不是网页", prefetch)
+            return None
+        try:
+            # 获取重定向后的最终URL，不需要时不发送HEAD请求
+            final_url = await self._resolve_final_url(url)
+
+            # 按该域名的历史成功率和耗时决定尝试顺序
+            domain = urlsplit(final_url).hostname or ""
+            await self._load_strategy_stats(domain)
+            order = self.fetchers.rank(domain)
+            logger.debug(f"{domain} 的抓取顺序: {order}")
+            if self.hedge_enable and len(order) > 1:
+                content = await self._hedged_fetch(final_url, domain, order)
             else:
-                if not has_bs4 and not has_requests:
-                    logger.warning("BeautifulSoup和requests库未安装，无法使用高级内容提取方法")
-                elif not has_bs4:
-                    logger.warning("BeautifulSoup库未安装，无法使用高级内容提取方法")
-                elif not has_requests:
-                    logger.warning("requests库未安装，无法使用高级内容提取方法")
-                if not has_requests_html:
-                    logger.warning("requests_html库未安装，动态内容提取功能不可用")
+                content = await self._sequential_fetch(final_url, domain, order)
+
+            if content:
+                return content
 
             # 所有方法都失败
             logger.error(f"所有内容提取方法均失败: {final_url}")
+            self._remember_fetch_failure(url, "网页无法访问或没有可提取的正文", prefetch)
             return None
         except asyncio.TimeoutError:
             logger.error(f"获取URL内容超时: URL: {url}")
+            self._remember_fetch_failure(url, "获取网页内容超时", prefetch)
             return None
         except Exception as e:
             logger.error(f"获取URL内容时出错: {e}, URL: {url}")
+            self._remember_fetch_failure(url, "获取网页内容出错", prefetch)
             return None
 
     def _get_default_headers(self):
@@ -379,7 +1392,6 @@ class AutoSummaryOpenAI(PluginBase):
             "User-Agent": selected_ua,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Accept-Language": "zh-CN,zh;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept-Encoding": "gzip, deflate, br",
             "Connection": "keep-alive",
             "Upgrade-Insecure-Requests": "1",
             "Cache-Control": "max-age=0",
@@ -389,10 +1401,11 @@ class AutoSummaryOpenAI(PluginBase):
             "Sec-Fetch-User": "?1"
         }
 
-    def _extract_content_general(self, url, headers=None):
+    @instrument_stage("extractor")
+    async def _extract_content_general(self, url, headers=None):
         """通用网页内容提取方法，使用静态页面提取
 
-        使用静态提取方法获取网页内容
+        使用共享的 aiohttp 会话获取网页，只把解析HTML交给线程池执行
 
         Args:
             url: 网页URL
@@ -405,207 +1418,86 @@ class AutoSummaryOpenAI(PluginBase):
             logger.error("BeautifulSoup库未安装，无法使用通用内容提取方法")
             return None
 
-        if not has_requests:
-            logger.error("requests库未安装，无法使用通用内容提取方法")
-            return None
-
         try:
             # 如果没有提供headers，创建一个默认的
             if not headers:
                 headers = self._get_default_headers()
 
-            # 添加随机延迟以避免被检测为爬虫
-            time.sleep(random.uniform(0.5, 2))
-
-            # 创建会话对象
-            session = requests.Session()
+            # 添加少量随机延迟以避免被检测为爬虫，不阻塞事件循环
+            await asyncio.sleep(random.uniform(0, 0.5))
 
             # 设置基本cookies
-            session.cookies.update({
+            cookies = {
                 f"visit_id_{int(time.time())}": f"{random.randint(1000000, 9999999)}",
                 "has_visited": "1",
-            })
+            }
 
             # 发送请求获取页面
             logger.debug(f"通用提取方法正在请求: {url}")
-            response = session.get(url, headers=headers, timeout=30)
-            response.raise_for_status()
-
-            # 确保编码正确
-            if response.encoding == 'ISO-8859-1':
-                response.encoding = response.apparent_encoding
-
-            # 使用BeautifulSoup解析HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 移除无用元素
-            for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'form', 'iframe']):
-                element.extract()
-
-            # 寻找可能的标题
-            title = None
-
-            # 尝试多种标题选择器
-            title_candidates = [
-                soup.select_one('h1'),  # 最常见的标题标签
-                soup.select_one('title'),  # HTML标题
-                soup.select_one('.title'),  # 常见的标题类
-                soup.select_one('.article-title'),  # 常见的文章标题类
-                soup.select_one('.post-title'),  # 博客标题
-                soup.select_one('[class*="title" i]'),  # 包含title的类
-            ]
-
-            for candidate in title_candidates:
-                if candidate and candidate.text.strip():
-                    title = candidate.text.strip()
-                    break
-
-            # 查找可能的内容元素
-            content_candidates = []
-
-            # 1. 尝试找常见的内容容器
-            content_selectors = [
-                'article', 'main', '.content', '.article', '.post-content',
-                '[class*="content" i]', '[class*="article" i]',
-                '.story', '.entry-content', '.post-body',
-                '#content', '#article', '.body'
-            ]
-
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                if elements:
-                    content_candidates.extend(elements)
-
-            # 2. 如果没有找到明确的内容容器，寻找具有最多文本的div元素
-            if not content_candidates:
-                paragraphs = {}
-                # 查找所有段落和div
-                for elem in soup.find_all(['p', 'div']):
-                    text = elem.get_text(strip=True)
-                    # 只考虑有实际内容的元素
-                    if len(text) > 100:
-                        paragraphs[elem] = len(text)
-
-                # 找出文本最多的元素
-                if paragraphs:
-                    max_elem = max(paragraphs.items(), key=lambda x: x[1])[0]
-                    # 如果是div，直接添加；如果是p，尝试找其父元素
-                    if max_elem.name == 'div':
-                        content_candidates.append(max_elem)
-                    else:
-                        # 找包含多个段落的父元素
-                        parent = max_elem.parent
-                        if parent and len(parent.find_all('p')) > 3:
-                            content_candidates.append(parent)
-                        else:
-                            content_candidates.append(max_elem)
-
-            # 3. 简单算法来评分和选择最佳内容元素
-            best_content = None
-            max_score = 0
-
-            for element in content_candidates:
-                # 计算文本长度
-                text = element.get_text(strip=True)
-                text_length = len(text)
-
-                # 计算文本密度（文本长度/HTML长度）
-                html_length = len(str(element))
-                text_density = text_length / html_length if html_length > 0 else 0
-
-                # 计算段落数量
-                paragraphs = element.find_all('p')
-                paragraph_count = len(paragraphs)
-
-                # 检查是否有图片
-                images = element.find_all('img')
-                image_count = len(images)
-
-                # 根据各种特征计算分数
-                score = (
-                    text_length * 1.0 +  # 文本长度很重要
-                    text_density * 100 +  # 文本密度很重要
-                    paragraph_count * 30 +  # 段落数量也很重要
-                    image_count * 10  # 图片不太重要，但也是一个指标
-                )
-
-                # 减分项：如果包含许多链接，可能是导航或侧边栏
-                links = element.find_all('a')
-                link_text_ratio = sum(len(a.get_text(strip=True)) for a in links) / text_length if text_length > 0 else 0
-                if link_text_ratio > 0.5:  # 如果链接文本占比过高
-                    score *= 0.5
-
-                # 更新最佳内容
-                if score > max_score:
-                    max_score = score
-                    best_content = element
-
-            # 如果找到内容，提取并清理文本
-            static_content_result = None
-            if best_content:
-                # 首先移除内容中可能的广告或无关元素
-                for ad in best_content.select('[class*="ad" i], [class*="banner" i], [id*="ad" i], [class*="recommend" i]'):
-                    ad.extract()
-
-                # 获取并清理文本
-                content_text = best_content.get_text(separator='\n', strip=True)
-
-                # 移除多余的空白行
-                content_text = re.sub(r'\n{3,}', '\n\n', content_text)
-
-                # 构建最终输出
-                result = ""
-                if title:
-                    result += f"标题: {title}\n\n"
-
-                result += content_text
-
-                logger.debug(f"通用提取方法成功，提取内容长度: {len(result)}")
-                static_content_result = result
-
-            # 判断静态提取的内容质量
-            content_is_good = False
-            if static_content_result:
-                # 内容长度检查
-                if len(static_content_result) > 50:
-                    content_is_good = True
-                # 结构检查 - 至少应该有多个段落
-                elif static_content_result.count('\n\n') >= 1:
-                    content_is_good = True
-
-            # 如果静态提取内容质量不佳，记录日志（动态提取方法已移除）
-            if not content_is_good:
-                logger.debug("静态提取内容质量不佳，但动态提取方法已移除")
-
-            return static_content_result
-
+            session = await self._get_session("origin")
+            timeout = aiohttp.ClientTimeout(total=30)
+            with timed(self.upstream_seconds, self.upstream_total, upstream="origin", target=self._metric_domain(url)):
+                async with session.get(url, headers=headers, cookies=cookies, proxy=self.sessions.proxy("origin"),
+                                       timeout=timeout) as response:
+                    response.raise_for_status()
+                    self._remember_validators(url, response.headers)
+                    # 非网页内容（图片、压缩包等）不下载
+                    content_type = response.headers.get("Content-Type")
+                    if not is_html_content_type(content_type):
+                        logger.warning(f"通用提取方法跳过非网页内容: {content_type}, URL: {url}")
+                        return None
+                    page, truncated = await read_capped(response, self.max_download_bytes)
+                    if truncated:
+                        logger.warning(f"网页超过下载上限 {self.max_download_bytes} 字节，只解析前面部分: {url}")
+                    # 编码依次取自响应头、页面开头的 BOM/meta 和 UTF-8 校验，无法确定时交给解析器检测
+                    encoding = detect_charset(page, response.charset)
+
+            loop = asyncio.get_running_loop()
+            with timed(self.stage_seconds, self.stage_total, stage="parse") as timer:
+                result = await loop.run_in_executor(None, self._parse_html_content, page, encoding)
+                if result is None:
+                    timer.outcome = "empty"
+                return result
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"通用内容提取方法失败: {str(e)}")
             return None
 
-    # 动态内容提取方法已移除
-
-    async def _send_to_openai(self, content: str, is_xiaohongshu: bool = False, custom_prompt: str = None) -> Optional[str]:
-        if not self.openai_enable:
-            return None
+    def _parse_html_content(self, page: bytes, encoding: Optional[str] = None) -> Optional[str]:
+        """从HTML中提取标题和正文（CPU密集，在线程池中执行）"""
         try:
-            session = await self._get_session()
-            content = content[:self.max_text_length]
+            start_time = time.time()
+            result = extract_article(page, encoding)
+            if result:
+                logger.debug(f"通用提取方法成功，提取内容长度: {len(result)}, "
+                             f"解析耗时: {time.time() - start_time:.3f}秒 ({HTML_PARSER})")
+            else:
+                logger.debug("静态提取未找到正文内容")
+            return result
+        except Exception as e:
+            logger.error(f"解析网页内容失败: {str(e)}")
+            return None
 
-            # 如果有自定义问题，使用自定义问题作为提示词，并添加固定前缀
-            if custom_prompt:
-                logger.info(f"使用自定义问题: {custom_prompt}")
-                prompt = f"""请根据下面**原文内容**回复：{custom_prompt}
+    # 动态内容提取方法已移除
+
+    def _build_prompt(self, content: str, is_xiaohongshu: bool = False, custom_prompt: str = None) -> str:
+        """根据内容类型和自定义问题构建提示词"""
+        # 如果有自定义问题，使用自定义问题作为提示词，并添加固定前缀
+        if custom_prompt:
+            logger.info(f"使用自定义问题: {custom_prompt}")
+            prompt = f"""请根据下面**原文内容**回复：{custom_prompt}
 
 **原文内容**：
 {content}
 """
-            else:
-                # 检查是否为GitHub个人主页
-                is_github_profile = "github.com" in content and ("overview" in content.lower() or "repositories" in content.lower())
+        else:
+            # 检查是否为GitHub个人主页
+            is_github_profile = "github.com" in content and ("overview" in content.lower() or "repositories" in content.lower())
 
-                if is_xiaohongshu:
-                    prompt = f"""请对以下小红书笔记进行详细全面的总结，提供丰富的信息：
+            if is_xiaohongshu:
+                prompt = f"""请对以下小红书笔记进行详细全面的总结，提供丰富的信息：
 1. 📝 全面概括笔记的核心内容和主旨（2-3句话）
 2. 🔑 详细的核心要点（5-7点，每点包含足够细节）
 3. 💡 作者的主要观点、方法或建议（至少3点）
@@ -617,8 +1509,8 @@ class AutoSummaryOpenAI(PluginBase):
 **原文内容**：
 {content}
 """
-                elif is_github_profile:
-                    prompt = f"""请对以下GitHub个人主页内容进行全面而详细的总结：
+            elif is_github_profile:
+                prompt = f"""请对以下GitHub个人主页内容进行全面而详细的总结：
 1. 📝 开发者身份和专业领域的完整概述（3-4句话）
 2. 🔑 主要项目和贡献（列出所有可见的重要项目及其功能描述）
 3. 💻 技术栈和专业技能（尽可能详细列出所有提到的技术）
@@ -632,161 +1524,441 @@ class AutoSummaryOpenAI(PluginBase):
 **原文内容**：
 {content}
 """
-                else:
-                    prompt = f"""你是一个新闻专家，请对以下**原文内容**进行摘要，提炼出核心观点和关键信息,要求语言简洁、准确、客观，并保持原文的主要意思。请不要添加个人评论或解读，仅对原文内容进行概括。输出不超过300字，不要使用加粗等markdown格式符号，包括以下4个部分：\n 标题（此处直接使用原文标题，禁止使用“标题”字眼）\n\n 📖 总结（一句话概括网页核心内容）\n\n💡 关键要点（用数字序号列出3-5个文章的核心内容）\n\n🏷 标签: #xx #xx（列出3到4个）。\n示例：openai工作流分享-JinaSum\n\n📖 总结\n本文介绍了如何通过 openai 工作流实现网页内容的自动总结，使用了 Jina 和 Firecrawl 两种方式。\n\n💡 关键要点 \n1. 工作流节点设置：创建一个包含开始节点、HTTP请求节点、LLM节点和结束节点的工作流。\n2. 网页链接输入：用户在开始节点输入要总结的网页链接。\n3. 网页内容爬取：利用 Jina 或 Firecrawl 服务爬取网页内容并转换为 Markdown 格式。\n4. 内容爬取：LLM节点接收爬取内容，并通过预设提示词进行总结。\n5. 整理结果：结束节点负责输出最终整理的总结内容。\n\n🏷 标签: #openai #工作流 #自动总结 #Jina #Firecrawl
+            else:
+                prompt = f"""你是一个新闻专家，请对以下**原文内容**进行摘要，提炼出核心观点和关键信息,要求语言简洁、准确、客观，并保持原文的主要意思。请不要添加个人评论或解读，仅对原文内容进行概括。输出不超过300字，不要使用加粗等markdown格式符号，包括以下4个部分：\n 标题（此处直接使用原文标题，禁止使用“标题”字眼）\n\n 📖 总结（一句话概括网页核心内容）\n\n💡 关键要点（用数字序号列出3-5个文章的核心内容）\n\n🏷 标签: #xx #xx（列出3到4个）。\n示例：openai工作流分享-JinaSum\n\n📖 总结\n本文介绍了如何通过 openai 工作流实现网页内容的自动总结，使用了 Jina 和 Firecrawl 两种方式。\n\n💡 关键要点 \n1. 工作流节点设置：创建一个包含开始节点、HTTP请求节点、LLM节点和结束节点的工作流。\n2. 网页链接输入：用户在开始节点输入要总结的网页链接。\n3. 网页内容爬取：利用 Jina 或 Firecrawl 服务爬取网页内容并转换为 Markdown 格式。\n4. 内容爬取：LLM节点接收爬取内容，并通过预设提示词进行总结。\n5. 整理结果：结束节点负责输出最终整理的总结内容。\n\n🏷 标签: #openai #工作流 #自动总结 #Jina #Firecrawl
 
 **原文内容**：
 {content}
 """
+        return prompt
+
+    @staticmethod
+    def _first_section_boundary(text: str) -> Optional[int]:
+        """查找总结第一段的结束位置（标题和📖总结之后，下一个要点段落之前）"""
+        if "📖" not in text:
+            return None
+        start = text.index("📖")
+        for marker in ("💡", "🔑"):
+            index = text.find(marker, start)
+            if index != -1:
+                return index
+        return None
+
+    async def _read_stream(self, response: aiohttp.ClientResponse,
+                           on_first_section: Optional[Callable[[str], Awaitable[None]]] = None) -> Optional[str]:
+        """逐行解析SSE流式响应，到达第一段边界时立即回调发送"""
+        text = ""
+        flushed = on_first_section is None
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8", errors="ignore").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                logger.warning(f"无法解析的流式数据: {data[:100]}")
+                continue
+            choices = chunk.get("choices") or []
+            if not choices:
+                continue
+            piece = (choices[0].get("delta") or {}).get("content")
+            if not piece:
+                continue
+            text += piece
+
+            if not flushed:
+                boundary = self._first_section_boundary(text)
+                if boundary:
+                    flushed = True
+                    await on_first_section(text[:boundary].rstrip())
+        return text or None
+
+    async def _call_openai(self, prompt: str,
+                           on_first_section: Optional[Callable[[str], Awaitable[None]]] = None,
+                           priority: int = PRIORITY_HIGH) -> Optional[str]:
+        """经过调度器排队和限流后发送请求，队列已满时抛出 SchedulerSaturated
+
+        每次尝试从端点池中选择进行中请求最少的端点。遇到 429/5xx 或网络错误时，
+        在 llm_deadline 秒内最多重试 llm_max_retries 次，并优先换一个端点：
+        有 Retry-After 时按其等待并暂停该端点，否则使用带抖动的指数退避。
+        """
+        wait = await self.llm_scheduler.acquire(priority)
+        self.llm_queue_wait_seconds.observe(wait, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        if wait > 1:
+            logger.info(f"openai请求排队 {wait:.2f} 秒, 优先级: {priority}")
+        try:
+            deadline = time.monotonic() + self.llm_deadline
+            tokens = estimate_tokens(prompt)
+            failed = set()
+            for attempt in range(self.llm_max_retries + 1):
+                member = await self.llm_pool.acquire(exclude=failed, deadline=deadline)
+                if member is None:
+                    logger.error("没有可用的openai端点，放弃请求")
+                    return None
+                ok = None
+                # 计入端点健康状态的结果：只有连接错误、超时和5xx算作端点故障，
+                # 4xx、429和响应解析失败不会让端点被摘除
+                healthy = None
+                error = ""
+                throttled = False
+                try:
+                    if not await member.request_bucket.acquire(1, deadline) or \
+                            not await member.token_bucket.acquire(tokens, deadline):
+                        logger.error(f"openai端点 {member.name} 限流等待超过截止时间，放弃请求")
+                        return None
+                    start = time.monotonic()
+                    ok = False
+                    result = await self._request_openai(member, prompt, on_first_section)
+                    ok = result is not None
+                    healthy = True if ok else None
+                    error = "" if ok else "请求被拒绝或响应无法解析"
+                    return result
+                except RetryableError as e:
+                    error = str(e)
+                    throttled = e.status == 429
+                    healthy = None if throttled else False
+                    failed.add(member.name)
+                    if e.retry_after is not None:
+                        delay = e.retry_after
+                    else:
+                        delay = backoff_delay(attempt)
+                    if e.status == 429:
+                        # 该端点已限流，暂停它的请求，避免继续触发429
+                        member.request_bucket.pause(delay)
+                    # 还有其他端点可用时立即换端点重试
+                    if self.llm_pool.has_available(failed):
+                        delay = 0
+                except asyncio.CancelledError:
+                    ok = None
+                    raise
+                finally:
+                    elapsed = time.monotonic() - start if ok is not None else 0.0
+                    self.llm_pool.release(member, healthy, elapsed, error)
+                    if ok is not None:
+                        if ok:
+                            outcome = "ok"
+                        elif throttled:
+                            outcome = "throttled"
+                        else:
+                            outcome = "error" if healthy is False else "rejected"
+                        self._record_upstream("llm", member.name, outcome, elapsed)
+
+                if attempt >= self.llm_max_retries or time.monotonic() + delay > deadline:
+                    logger.error(f"调用openai API失败，不再重试: [{member.name}] {error}")
+                    return None
+                logger.warning(f"调用openai API失败: [{member.name}] {error}, "
+                               f"{delay:.1f}秒后重试 ({attempt + 1}/{self.llm_max_retries})")
+                if delay:
+                    await asyncio.sleep(delay)
+            return None
+        finally:
+            self.llm_scheduler.release()
+
+    async def _request_openai(self, member: PoolMember, prompt: str,
+                              on_first_section: Optional[Callable[[str], Awaitable[None]]] = None) -> Optional[str]:
+        """向端点发送一次 chat/completions 请求，返回生成的内容，失败返回 None"""
+        try:
+            session = await self._get_session("llm")
             messages = [{"role": "user", "content": prompt}]
             headers = {
-                "Authorization": f"Bearer {self.openai_api_key}",
+                "Authorization": f"Bearer {member.api_key}",
                 "Content-Type": "application/json"
             }
             payload = {
-                "model": self.model,
-                "stream": False,
+                "model": member.model,
+                "stream": self.openai_stream,
                 "messages": messages,
                 "temperature": 0.7
             }
-            url = f"{self.openai_base_url}/chat/completions"
+            url = f"{member.base_url}/chat/completions"
 
             # 设置超时时间为60秒
             timeout = aiohttp.ClientTimeout(total=60)
-            try:
-                async with session.post(
-                    url=url,
-                    headers=headers,
-                    json=payload,
-                    proxy=self.http_proxy if self.http_proxy else None,
-                    timeout=timeout
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"调用openai API失败: {response.status} - {error_text}")
-                        return None
-            except asyncio.TimeoutError:
-                logger.error("调用openai API超时")
-                return None
-            except Exception as e:
-                logger.error(f"调用openai API时出错: {e}")
-                return None
+            async with session.post(
+                url=url,
+                headers=headers,
+                json=payload,
+                proxy=member.http_proxy if member.http_proxy else None,
+                timeout=timeout
+            ) as response:
+                if response.status == 200:
+                    # 部分兼容接口不支持流式，按实际返回的类型解析
+                    if "text/event-stream" in response.headers.get("Content-Type", ""):
+                        return await self._read_stream(response, on_first_section)
+                    result = await response.json(content_type=None)
+                    return result["choices"][0]["message"]["content"]
+                else:
+                    error_text = await response.text()
+                    if response.status == 429 or response.status >= 500:
+                        raise RetryableError(f"{response.status} - {error_text[:200]}",
+                                             retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                                             status=response.status)
+                    logger.error(f"调用openai API失败: {response.status} - {error_text}")
+                    return None
+        except RetryableError:
+            raise
         except asyncio.TimeoutError:
-            logger.error("调用openai API超时")
-            return None
+            raise RetryableError("调用openai API超时")
+        except aiohttp.ClientConnectionError as e:
+            raise RetryableError(f"连接openai API失败: {e}")
         except Exception as e:
             logger.error(f"调用openai API时出错: {e}")
             return None
 
-    def _process_xml_message(self, message: Dict) -> Optional[Dict]:
-        try:
-            content = message.get("Content", "")
-            msg_id = message.get('MsgId', '')
-            logger.info(f"插件处理XML消息: MsgId={msg_id}")
-
-            # 检查消息类型
-            msg_type = message.get("MsgType", 0)
-            logger.info(f"消息类型: {msg_type}")
-
-            # 检查内容是否为XML
-            if not content.strip().startswith('<'):
-                logger.warning("消息内容不是XML格式")
-                return None
-
-            logger.debug(f"完整XML内容: {content}")
-
-            try:
-                root = ET.fromstring(content)
-                logger.info(f"解析XML根节点: {root.tag}")
-
-                # 记录所有子节点以便调试
-                for child in root:
-                    logger.debug(f"子节点: {child.tag}")
-            except ET.ParseError as e:
-                logger.error(f"XML解析错误: {str(e)}")
-                logger.error(f"XML内容片段: {content[:200]}...")
-                return None
+    def _get_qa_index(self, content_hash: str, content: str) -> BM25Index:
+        """获取原文的片段索引，同一篇内容只建立一次"""
+        index = self.qa_index_cache.get(content_hash)
+        self.cache_total.inc(cache="qa_index", result="hit" if index is not None else "miss")
+        if index is None:
+            index = BM25Index(self._split_chunks(content, self.qa_chunk_size))
+            self.qa_index_cache.set(content_hash, index)
+        return index
+
+    def _build_qa_prompt(self, question: str, summary: str, index: BM25Index) -> str:
+        """追问提示词：已有总结加上与问题最相关的原文片段（按原文顺序排列）"""
+        hits = index.search(question, self.qa_top_k)
+        if hits:
+            selected = sorted(i for i, _ in hits)
+        else:
+            # 问题与原文没有共同词项时（例如"这篇文章讲了什么"），使用文章开头的片段
+            selected = list(range(min(self.qa_top_k, len(index.chunks))))
+        excerpts = "\n\n".join(f"【片段{i + 1}】\n{index.chunks[i]}" for i in selected)
+        logger.info(f"追问检索: 片段总数={len(index.chunks)}, 选中={[i + 1 for i in selected]}")
+        return f"""请根据下面的**文章总结**和**原文片段**回复：{question}
+如果提供的内容不足以回答，请说明原文中没有相关信息，不要编造。
+
+**文章总结**：
+{summary}
+
+**原文片段**：
+{excerpts}
+"""
 
-            appmsg = root.find('appmsg')
-            if appmsg is None:
-                logger.warning("未找到 appmsg 节点")
-                return None
+    @instrument_stage("qa")
+    async def _answer_question(self, cache_data: Dict, question: str) -> Optional[str]:
+        """回答追问，只发送总结和检索到的原文片段，不再发送全文"""
+        if not self.openai_enable:
+            return None
+        entry = cache_data["entry"]
+        content = await self._load_body(entry["content_hash"])
+        if content is None:
+            logger.warning(f"总结对应的原文已被淘汰: {cache_data['key']}")
+            return None
+        index = self._get_qa_index(entry["content_hash"], content)
+        prompt = self._build_qa_prompt(question, entry["summary"], index)
+        return await self._call_openai(prompt, priority=PRIORITY_HIGH)
+
+    def _split_chunks(self, content: str, chunk_size: int) -> list:
+        """按段落边界把长文切分为不超过 chunk_size 的片段，超长段落按长度硬切分"""
+        chunks = []
+        current = ""
+        for paragraph in re.split(r'\n\s*\n', content):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            while len(paragraph) > chunk_size:
+                if current:
+                    chunks.append(current)
+                    current = ""
+                chunks.append(paragraph[:chunk_size])
+                paragraph = paragraph[chunk_size:]
+            if current and len(current) + len(paragraph) + 2 > chunk_size:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _map_chunks(self, content: str, custom_prompt: str = None,
+                          priority: int = PRIORITY_HIGH) -> Optional[str]:
+        """分块总结长文（map 阶段），返回拼接后的各部分要点
+
+        各分块并发总结，并发数不超过 chunk_concurrency，整体耗时取决于最慢的分块。
+        任一分块抛出异常（队列已满、超时等）时取消其余分块，不再消耗额度。
+        """
+        chunks = self._split_chunks(content, self.chunk_size)
+        if len(chunks) > self.max_chunks:
+            logger.warning(f"长文分块数 {len(chunks)} 超过上限 {self.max_chunks}，只总结前 {self.max_chunks} 块")
+            chunks = chunks[:self.max_chunks]
+        total = len(chunks)
+        # 各部分要点合计不超过 max_text_length，保证 reduce 阶段不会被截断
+        note_length = max(200, self.max_text_length // total // 2)
+        focus = f"，重点提取与问题“{custom_prompt}”相关的信息" if custom_prompt else ""
+        logger.info(f"长文分块总结: 原文长度={len(content)}, 分块数={total}, 并发数={self.chunk_concurrency}")
 
-            logger.info("找到 appmsg 节点")
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
 
-            # 记录appmsg的所有子节点
-            for child in appmsg:
-                logger.debug(f"appmsg子节点: {child.tag} = {child.text if child.text else ''}")
+        async def summarize_chunk(index: int, chunk: str) -> Optional[str]:
+            prompt = f"""以下是一篇长文的第{index + 1}/{total}部分。请提炼这一部分的关键信息、数据和观点{focus}，用简洁的要点列出，不超过{note_length}字。如果这一部分包含文章标题，请在第一行原样保留标题。不要添加个人评论。
 
-            title_elem = appmsg.find('title')
-            des_elem = appmsg.find('des')
-            url_elem = appmsg.find('url')
-            type_elem = appmsg.find('type')
+**原文内容**：
+{chunk}
+"""
+            async with semaphore:
+                return await self._call_openai(prompt, priority=priority)
 
-            title = title_elem.text if title_elem is not None and title_elem.text else ""
-            description = des_elem.text if des_elem is not None and des_elem.text else ""
-            url = url_elem.text if url_elem is not None and url_elem.text else None
-            type_value = type_elem.text if type_elem is not None and type_elem.text else ""
+        tasks = [asyncio.create_task(summarize_chunk(i, chunk)) for i, chunk in enumerate(chunks)]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            errors = [task.exception() for task in done if task.exception() is not None]
+            if errors:
+                raise errors[0]
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+        results = [task.result() for task in tasks]
+        notes = [f"【第{i + 1}部分要点】\n{note.strip()}" for i, note in enumerate(results) if note]
+        if not notes:
+            logger.error("长文分块总结全部失败")
+            return None
+        if len(notes) < total:
+            logger.warning(f"长文分块总结部分失败: 成功 {len(notes)}/{total}")
+        return "\n\n".join(notes)
+
+    @instrument_stage("llm")
+    async def _send_to_openai(self, content: str, is_xiaohongshu: bool = False, custom_prompt: str = None,
+                              on_first_section: Optional[Callable[[str], Awaitable[None]]] = None,
+                              priority: int = PRIORITY_HIGH) -> Optional[str]:
+        """调用openai生成总结
+
+        开启流式模式时逐块接收结果，on_first_section 会在第一段（标题和📖总结）
+        生成完成时被调用，调用方可以先把这部分发给用户。返回值始终是完整内容。
+        开启分块总结时，超过 max_text_length 的长文先分块并发提炼要点，
+        再用原有的提示词对要点做最终总结（reduce 阶段）。
+        priority 为调度优先级，请求队列已满时抛出 SchedulerSaturated。
+        """
+        if not self.openai_enable:
+            return None
+        try:
+            if self.chunked_summary and len(content) > self.max_text_length:
+                notes = await self._map_chunks(content, custom_prompt, priority=priority)
+                if notes:
+                    content = notes
+                else:
+                    logger.warning("分块总结失败，使用截断后的原文总结")
+            content = content[:self.max_text_length]
+            prompt = self._build_prompt(content, is_xiaohongshu=is_xiaohongshu, custom_prompt=custom_prompt)
+            return await self._call_openai(prompt, on_first_section, priority=priority)
+        except SchedulerSaturated:
+            raise
+        except Exception as e:
+            logger.error(f"调用openai API时出错: {e}")
+            return None
 
-            logger.info(f"提取的标题: {title}")
-            logger.info(f"提取的描述: {description}")
-            logger.info(f"提取的URL: {url}")
-            logger.info(f"消息类型值: {type_value}")
+    async def _summarize_shared(self, cache_key: tuple, content: str, is_xiaohongshu: bool = False,
+                                custom_prompt: str = None,
+                                on_first_section: Optional[Callable[[str], Awaitable[None]]] = None,
+                                priority: int = PRIORITY_HIGH) -> Optional[Dict]:
+        """生成总结并写入共享缓存，相同缓存键的并发请求只调用一次openai
 
-            if url is None or not url.strip():
-                logger.warning("URL为空，跳过处理")
-                return None
+        合并的请求只有第一个调用者会收到流式的第一段回调，其他调用者拿到完整结果。
+        内容哈希与过期总结的相同时直接沿用过期总结，不调用openai。
+        低优先级请求可以合并到高优先级的总结中，高优先级请求不会合并到低优先级的总结中，
+        避免显式命令随自动总结一起被挤出队列。
+        """
+        async def summarize() -> Optional[Dict]:
+            entry = await self._get_shared_summary(cache_key)
+            if entry:
+                return entry
+            stale = await self._get_stale_summary(cache_key) if self.revalidate_enable else None
+            if stale and stale["content_hash"] == self.bodies.digest(content):
+                logger.info(f"内容未变化，沿用已有总结: {cache_key}")
+                self.cache_total.inc(cache="summary", result="unchanged")
+                summary = stale["summary"]
+            else:
+                summary = await self._send_to_openai(content, is_xiaohongshu=is_xiaohongshu,
+                                                     custom_prompt=custom_prompt,
+                                                     on_first_section=on_first_section, priority=priority)
+                if not summary:
+                    return None
+            entry = {
+                "summary": summary,
+                "content_hash": self.bodies.put(content),
+                "timestamp": time.time()
+            }
+            self.shared_summary_cache.set(cache_key, entry)
+            if self.store:
+                # 原文单独按内容哈希保存，内存中的正文被淘汰后可以重新加载
+                stored = {
+                    "summary": summary,
+                    "content_hash": self._persist_body(content, entry["timestamp"]),
+                    "timestamp": entry["timestamp"]
+                }
+                self.store.put("summary", self._store_key(cache_key), stored, timestamp=entry["timestamp"],
+                               ttl=self.expiration_time + self.stale_keep_time)
+            return entry
 
-            url = html.unescape(url)
-            logger.info(f"处理后的URL: {url}")
+        flight_key = (cache_key, priority)
+        if priority != PRIORITY_HIGH and self._summary_flight.in_flight((cache_key, PRIORITY_HIGH)):
+            flight_key = (cache_key, PRIORITY_HIGH)
+        if self._summary_flight.in_flight(flight_key):
+            logger.info(f"相同内容正在总结中，等待已有请求: {cache_key}")
+        return await self._summary_flight.do(flight_key, summarize)
 
-            # 检查是否是小红书
-            is_xiaohongshu = '<appname>小红书</appname>' in content
-            if is_xiaohongshu:
-                logger.info("检测到小红书卡片")
-
-            result = {
-                'title': title,
-                'description': description,
-                'url': url,
-                'is_xiaohongshu': is_xiaohongshu,
-                'type': type_value
-            }
-            logger.info(f"提取的信息: {result}")
-            return result
+    def _process_xml_message(self, message: Dict) -> Optional[Dict]:
+        """提取卡片的标题、描述、URL、类型，并判断是否为小红书"""
+        content = message.get("Content", "")
+        msg_id = message.get('MsgId', '')
+        logger.info(f"插件处理XML消息: MsgId={msg_id}, 消息类型: {message.get('MsgType', 0)}")
 
-        except ET.ParseError as e:
-            logger.error(f"XML解析错误: {str(e)}")
-            logger.error(f"XML内容片段: {content[:200] if 'content' in locals() else ''}...")
-            return None
+        try:
+            result = parse_card_xml(content)
         except Exception as e:
             logger.error(f"处理XML消息时出错: {str(e)}")
             logger.exception(e)
             return None
 
-    async def _process_url(self, url: str, chat_id: str, custom_prompt: str = None) -> Optional[str]:
+        if result is None:
+            logger.warning(f"XML解析失败或URL为空，跳过处理，内容片段: {content[:200]}...")
+            return None
+        if result['is_xiaohongshu']:
+            logger.info("检测到小红书卡片")
+        logger.info(f"提取的信息: {result}")
+        return result
+
+    def _is_duplicate_card(self, message: Dict) -> bool:
+        """同一条卡片消息可能同时触发文章消息和文件消息事件，按 MsgId 只处理一次"""
+        msg_id = message.get("MsgId")
+        if not msg_id:
+            return False
+        key = str(msg_id)
+        if key in self._seen_card_msgs:
+            return True
+        self._seen_card_msgs.set(key, True)
+        return False
+
+    @instrument_stage("process_url")
+    async def _process_url(self, url: str, chat_id: str, custom_prompt: str = None,
+                           on_first_section: Optional[Callable[[str], Awaitable[None]]] = None) -> Optional[str]:
         try:
+            # 先查询跨聊天共享的总结缓存
+            cache_key = self._summary_cache_key(url, custom_prompt=custom_prompt)
+            entry = await self._get_shared_summary(cache_key)
+            if entry:
+                logger.info(f"命中共享总结缓存: {cache_key}, chat_id={chat_id}")
+                self._bind_summary(chat_id, cache_key, entry)
+                return entry["summary"]
+
             url_content = await self._fetch_url_content(url)
             if not url_content:
                 return None
 
-            # 获取总结内容
-            task = asyncio.create_task(self._send_to_openai(url_content, custom_prompt=custom_prompt))
-            summary = await task
-
-            if summary:
-                # 缓存总结内容和原始内容
-                self.summary_cache[chat_id] = {
-                    "summary": summary,
-                    "original_content": url_content,
-                    "timestamp": time.time()
-                }
-                logger.info(f"已缓存总结内容，chat_id={chat_id}, 总结长度={len(summary)}")
+            # 获取总结内容，并缓存总结内容和原始内容
+            entry = await self._summarize_shared(cache_key, url_content, custom_prompt=custom_prompt,
+                                                 on_first_section=on_first_section)
+            if not entry:
+                return None
 
-            return summary
+            self._bind_summary(chat_id, cache_key, entry)
+            logger.info(f"已缓存总结内容，chat_id={chat_id}, 总结长度={len(entry['summary'])}")
+            return entry["summary"]
+        except SchedulerSaturated:
+            raise
         except asyncio.TimeoutError:
             logger.error(f"处理URL时超时: {url}")
             return None
@@ -794,19 +1966,35 @@ class AutoSummaryOpenAI(PluginBase):
             logger.error(f"处理URL时出错: {e}")
             return None
 
-    async def _handle_card_message(self, bot: 'WechatAPIClient', chat_id: str, info: Dict, custom_prompt: str = None) -> bool:
+    @instrument_stage("card")
+    async def _handle_card_message(self, bot: 'WechatAPIClient', chat_id: str, info: Dict, custom_prompt: str = None,
+                                   priority: int = PRIORITY_HIGH) -> bool:
+        progress_sent = False
         try:
+            url = info['url']
+            is_xiaohongshu = info.get('is_xiaohongshu', False)
+
+            # 先查询跨聊天共享的总结缓存，命中时直接回复
+            cache_key = self._summary_cache_key(url, is_xiaohongshu=is_xiaohongshu, custom_prompt=custom_prompt)
+            entry = await self._get_shared_summary(cache_key)
+            if entry:
+                logger.info(f"命中共享总结缓存: {cache_key}, chat_id={chat_id}")
+                self._bind_summary(chat_id, cache_key, entry)
+                await bot.send_text_message(chat_id, f"{entry['summary']}")
+                return False
+
             # 发送正在处理的消息
             await bot.send_text_message(chat_id, "🎉正在为您生成总结，请稍候...")
+            progress_sent = True
+            delivery = SummaryDelivery(bot, chat_id, self.delivery_seconds)
 
             # 获取URL内容
-            url = info['url']
             logger.info(f"开始获取卡片URL内容: {url}")
             url_content = await self._fetch_url_content(url)
 
             if not url_content:
                 logger.warning(f"无法获取卡片内容: {url}")
-                await bot.send_text_message(chat_id, "❌ 抱歉，无法获取卡片内容")
+                await bot.send_text_message(chat_id, self._fetch_failure_message(url, "❌ 抱歉，无法获取卡片内容"))
                 return False
 
             logger.info(f"成功获取卡片内容，长度: {len(url_content)}")
@@ -822,25 +2010,22 @@ class AutoSummaryOpenAI(PluginBase):
             #await bot.send_text_message(chat_id, "🔍 正在为您生成详细内容总结，请稍候...")
 
             # 调用openai API生成总结
-            is_xiaohongshu = info.get('is_xiaohongshu', False)
             logger.info(f"开始生成总结, 是否小红书: {is_xiaohongshu}")
 
             # 使用自定义问题（如果有）
             if custom_prompt:
                 logger.info(f"使用自定义问题处理卡片: {custom_prompt}")
-                #summary = await self._send_to_openai(content_to_summarize, is_xiaohongshu=is_xiaohongshu, custom_prompt=custom_prompt)
-                task = asyncio.create_task(self._send_to_openai(content_to_summarize, is_xiaohongshu=is_xiaohongshu, custom_prompt=custom_prompt))
-                summary = await task
-            else:
-                #summary = await self._send_to_openai(content_to_summarize, is_xiaohongshu=is_xiaohongshu)
-                task = asyncio.create_task(self._send_to_openai(content_to_summarize, is_xiaohongshu=is_xiaohongshu))
-                summary = await task
+            entry = await self._summarize_shared(cache_key, content_to_summarize, is_xiaohongshu=is_xiaohongshu,
+                                                 custom_prompt=custom_prompt,
+                                                 on_first_section=delivery.send_first_section,
+                                                 priority=priority)
 
-            if not summary:
+            if not entry:
                 logger.error("生成总结失败")
                 await bot.send_text_message(chat_id, "❌ 抱歉，生成总结失败")
                 return False
 
+            summary = entry["summary"]
             logger.info(f"成功生成总结，长度: {len(summary)}")
 
             # 根据卡片类型设置前缀
@@ -848,18 +2033,23 @@ class AutoSummaryOpenAI(PluginBase):
             # await bot.send_text_message(chat_id, f"{prefix}：\n\n{summary}")
 
             # 缓存总结内容和原始内容
-            self.summary_cache[chat_id] = {
-                "summary": summary,
-                "original_content": content_to_summarize,
-                "timestamp": time.time()
-            }
+            self._bind_summary(chat_id, cache_key, entry)
             logger.info(f"已缓存卡片总结内容，chat_id={chat_id}, 总结长度={len(summary)}")
 
             # 发送总结，直接返回内容，不添加前缀
-            await bot.send_text_message(chat_id, f"{summary}")
+            await delivery.send_summary(summary)
             logger.info("总结已发送")
             return False  # 阻止后续处理
 
+        except SchedulerSaturated as e:
+            if priority == PRIORITY_LOW:
+                # 自动总结被挤出队列时卡片保留供手动总结，已提示正在生成时告知用户稍后手动发送命令
+                if progress_sent:
+                    await bot.send_text_message(chat_id, f"⏳ 当前请求较多，可稍后发送 {self.sum_trigger} 生成总结")
+                raise
+            logger.warning(f"openai请求队列已满，放弃处理卡片: {e}")
+            await bot.send_text_message(chat_id, "❌ 当前请求较多，请稍后再试")
+            return False
         except asyncio.TimeoutError:
             logger.error("处理卡片消息时超时")
             await bot.send_text_message(chat_id, "❌ 抱歉，处理卡片内容时超时，请稍后再试")
@@ -885,18 +2075,20 @@ class AutoSummaryOpenAI(PluginBase):
         logger.info(f"收到{chat_type}文本消息: chat_id={chat_id}, sender_id={sender_id}, content={content[:100]}...")
         content = html.unescape(content)
 
-        # 清理过期的链接和卡片
+        # 恢复持久化的聊天状态，并清理过期的链接和卡片
+        await self._load_chat_state(chat_id)
         self._clean_expired_items()
 
+        # 一次匹配完成消息分类，并提取问题、自定义问题和URL
+        route = self.router.route(content)
+
         # 检查是否是追问命令
-        if self._is_qa_command(content):
+        if route.kind == "qa":
             logger.info(f"检测到追问命令: {content}")
 
             # 检查是否有总结缓存
             if chat_id in self.summary_cache:
-                # 提取问题内容，使用正则表达式处理不定数量的空格
-                question_match = re.match(f"^{re.escape(self.qa_trigger)}\\s*(.*?)$", content)
-                question = question_match.group(1).strip() if question_match else ""
+                question = route.argument
 
                 if not question:
                     await bot.send_text_message(chat_id, "❓ 请在追问命令后提供具体问题，例如：问这篇文章的主要观点是什么？")
@@ -904,24 +2096,27 @@ class AutoSummaryOpenAI(PluginBase):
 
                 logger.info(f"提取到追问问题: {question}")
 
-                # 构建追问提示词
                 cache_data = self.summary_cache[chat_id]
-                original_content = cache_data["original_content"]
 
                 # 发送追问到openai
                 try:
-                    # 发送追问到openai，直接使用custom_prompt参数传递问题
-                    answer = await self._send_to_openai(original_content, custom_prompt=question)
+                    # 从原文中检索相关片段，和总结一起发送
+                    answer = await self._answer_question(cache_data, question)
 
                     if answer:
                         # 发送回答
                         await bot.send_text_message(chat_id, f"{answer}")
                         # 更新缓存时间戳
                         self.summary_cache[chat_id]["timestamp"] = time.time()
+                        self._on_chat_state_changed(chat_id, "summary")
                         return False
                     else:
                         await bot.send_text_message(chat_id, "❌ 抱歉，无法回答您的问题")
                         return False
+                except SchedulerSaturated as e:
+                    logger.warning(f"openai请求队列已满，放弃处理追问: {e}")
+                    await bot.send_text_message(chat_id, "❌ 当前请求较多，请稍后再试")
+                    return False
                 except asyncio.TimeoutError:
                     logger.error("处理追问时超时")
                     await bot.send_text_message(chat_id, "❌ 抱歉，处理追问过程中超时，请稍后再试")
@@ -935,53 +2130,37 @@ class AutoSummaryOpenAI(PluginBase):
                 return False
 
         # 检查是否是总结命令
-        elif self._is_summary_command(content):
+        elif route.kind == "summary":
             logger.info(f"检测到总结命令: {content}")
 
             # 检查是否是 "{sum_trigger} [自定义问题] [URL]" 或 "{sum_trigger} [URL]" 格式
-            # 支持触发词和自定义问题之间有不定数量的空格或没有空格
-            url_pattern = f"({self.sum_trigger})\\s*(.*?)\\s*({self.URL_PATTERN})"
-            url_match = re.search(url_pattern, content)
-
-            if url_match:
+            if route.urls:
                 # 从命令中提取URL和可能的自定义问题
-                url = re.findall(self.URL_PATTERN, content)[0]
+                url = route.urls[0]
                 logger.info(f"从总结命令中提取URL: {url}")
 
-                # 提取自定义问题（如果有）
-                custom_prompt = None
-
-                # 使用正则表达式匹配结果提取自定义问题
-                if url_match and len(url_match.groups()) >= 3:
-                    # 第二个捕获组是自定义问题部分
-                    custom_prompt_part = url_match.group(2).strip()
-                    if custom_prompt_part:
-                        custom_prompt = custom_prompt_part
-                        logger.info(f"使用正则提取到自定义问题: {custom_prompt}")
-
-                # 如果正则提取失败，使用替换方法尝试提取
-                if not custom_prompt:
-                    # 使用正则表达式移除触发词，支持触发词后有不定数量的空格或没有空格
-                    content_without_trigger = re.sub(f"^{re.escape(self.sum_trigger)}\\s*", "", content, 1).strip()
-                    # 移除URL
-                    content_without_url = content_without_trigger.replace(url, "", 1).strip()
-
-                    if content_without_url:
-                        custom_prompt = content_without_url
-                        logger.info(f"使用替换方法提取到自定义问题: {custom_prompt}")
+                custom_prompt = route.argument or None
+                if custom_prompt:
+                    logger.info(f"提取到自定义问题: {custom_prompt}")
 
                 if self._check_url(url):
                     try:
                         #await bot.send_text_message(chat_id, "🔍 正在为您生成详细内容总结，请稍候...")
-                        summary = await self._process_url(url, chat_id, custom_prompt)
+                        delivery = SummaryDelivery(bot, chat_id, self.delivery_seconds)
+                        summary = await self._process_url(url, chat_id, custom_prompt,
+                                                          on_first_section=delivery.send_first_section)
                         if summary:
                             # await bot.send_text_message(chat_id, f"🎯 详细内容总结如下：\n\n{summary}")
                             # 直接返回总结内容，不添加前缀
-                            await bot.send_text_message(chat_id, f"{summary}")
+                            await delivery.send_summary(summary)
                             return False
                         else:
-                            await bot.send_text_message(chat_id, "❌ 抱歉，生成总结失败")
+                            await bot.send_text_message(chat_id, self._fetch_failure_message(url, "❌ 抱歉，生成总结失败"))
                             return False
+                    except SchedulerSaturated as e:
+                        logger.warning(f"openai请求队列已满，放弃处理URL: {e}")
+                        await bot.send_text_message(chat_id, "❌ 当前请求较多，请稍后再试")
+                        return False
                     except asyncio.TimeoutError:
                         logger.error("处理URL时超时")
                         await bot.send_text_message(chat_id, "❌ 抱歉，处理过程中超时，请稍后再试")
@@ -996,28 +2175,32 @@ class AutoSummaryOpenAI(PluginBase):
                 url = self.recent_urls[chat_id]["url"]
                 logger.info(f"开始总结最近的URL: {url}")
 
-                # 提取可能的自定义问题
-                custom_prompt = None
-                # 使用正则表达式移除触发词，支持触发词后有不定数量的空格或没有空格
-                content_without_trigger = re.sub(f"^{re.escape(self.sum_trigger)}\\s*", "", content, 1).strip()
-
-                if content_without_trigger:
-                    custom_prompt = content_without_trigger
+                # 提取可能的自定义问题（触发词之后的文字）
+                custom_prompt = route.argument or None
+                if custom_prompt:
                     logger.info(f"提取到自定义问题: {custom_prompt}")
 
                 try:
                     #await bot.send_text_message(chat_id, "🔍 正在为您生成详细内容总结，请稍候...")
-                    summary = await self._process_url(url, chat_id, custom_prompt)
+                    delivery = SummaryDelivery(bot, chat_id, self.delivery_seconds)
+                    summary = await self._process_url(url, chat_id, custom_prompt,
+                                                      on_first_section=delivery.send_first_section)
                     if summary:
                         # await bot.send_text_message(chat_id, f"🎯 详细内容总结如下：\n\n{summary}")
                         # 直接返回总结内容，不添加前缀
-                        await bot.send_text_message(chat_id, f"{summary}")
+                        await delivery.send_summary(summary)
                         # 总结后删除该URL（总结内容已经缓存到summary_cache中）
-                        del self.recent_urls[chat_id]
+                        # 等待期间该条目可能已过期、被淘汰或被其他消息删除
+                        self.recent_urls.pop(chat_id, None)
+                        self._on_chat_state_changed(chat_id, "url")
                         return False
                     else:
-                        await bot.send_text_message(chat_id, "❌ 抱歉，生成总结失败")
+                        await bot.send_text_message(chat_id, self._fetch_failure_message(url, "❌ 抱歉，生成总结失败"))
                         return False
+                except SchedulerSaturated as e:
+                    logger.warning(f"openai请求队列已满，放弃处理URL: {e}")
+                    await bot.send_text_message(chat_id, "❌ 当前请求较多，请稍后再试")
+                    return False
                 except asyncio.TimeoutError:
                     logger.error("处理URL时超时")
                     await bot.send_text_message(chat_id, "❌ 抱歉，处理过程中超时，请稍后再试")
@@ -1032,20 +2215,17 @@ class AutoSummaryOpenAI(PluginBase):
                 card_info = self.recent_cards[chat_id]["info"]
                 logger.info(f"开始总结最近的卡片: {card_info['title']}")
 
-                # 提取可能的自定义问题
-                custom_prompt = None
-                # 使用正则表达式移除触发词，支持触发词后有不定数量的空格或没有空格
-                content_without_trigger = re.sub(f"^{re.escape(self.sum_trigger)}\\s*", "", content, 1).strip()
-
-                if content_without_trigger:
-                    custom_prompt = content_without_trigger
+                # 提取可能的自定义问题（触发词之后的文字）
+                custom_prompt = route.argument or None
+                if custom_prompt:
                     logger.info(f"提取到卡片自定义问题: {custom_prompt}")
 
                 try:
                     # 处理卡片消息，传入自定义问题
                     await self._handle_card_message(bot, chat_id, card_info, custom_prompt)
                     # 总结后删除该卡片
-                    del self.recent_cards[chat_id]
+                    self.recent_cards.pop(chat_id, None)
+                    self._on_chat_state_changed(chat_id, "card")
                     return False
                 except asyncio.TimeoutError:
                     logger.error("处理卡片时超时")
@@ -1063,7 +2243,7 @@ class AutoSummaryOpenAI(PluginBase):
                 return False
 
         # 如果不是总结命令，检查是否包含URL
-        urls = re.findall(self.URL_PATTERN, content)
+        urls = route.urls
         if urls:
             url = urls[0]
             logger.info(f"找到URL: {url}")
@@ -1083,7 +2263,10 @@ class AutoSummaryOpenAI(PluginBase):
                     "url": url,
                     "timestamp": time.time()
                 }
+                self._on_chat_state_changed(chat_id, "url")
                 logger.info(f"已存储群聊非@bot的URL: {url} 供后续手动总结使用")
+                if self.prefetch_enable:
+                    self._schedule_prefetch(url)
                 # await bot.send_text_message(chat_id, f"🔗 检测到链接，发送\"{self.sum_trigger}\"命令可以生成内容总结")
 
         return True
@@ -1103,6 +2286,10 @@ class AutoSummaryOpenAI(PluginBase):
         chat_type = "群聊" if is_group else "私聊"
         logger.info(f"收到{chat_type}文章消息: MsgId={msg_id}, chat_id={chat_id}, sender_id={sender_id}")
 
+        if self._is_duplicate_card(message):
+            logger.info(f"卡片消息已处理过，跳过重复投递: MsgId={msg_id}")
+            return True
+
         try:
             # 处理XML消息
             card_info = self._process_xml_message(message)
@@ -1117,18 +2304,27 @@ class AutoSummaryOpenAI(PluginBase):
                 "info": card_info,
                 "timestamp": time.time()
             }
+            self._on_chat_state_changed(chat_id, "card")
             logger.info(f"已存储文章信息: {card_info['title']} 供后续总结使用")
 
             # 检查是否应该自动总结
             # 传入群ID/用户ID和发送者ID
             if self._should_auto_summarize(chat_id, is_group, sender_id):
+                # 请求较多时不自动总结，卡片保留在 recent_cards 中，可稍后手动发送总结命令
+                if self.llm_scheduler.is_saturated(PRIORITY_LOW):
+                    logger.warning(f"openai请求队列已满，跳过自动总结文章: {card_info['title']}")
+                    return True
                 logger.info(f"自动总结文章: {card_info['title']}")
                 try:
-                    # 处理卡片消息
-                    await self._handle_card_message(bot, chat_id, card_info)
+                    # 处理卡片消息，自动总结使用低优先级
+                    await self._handle_card_message(bot, chat_id, card_info, priority=PRIORITY_LOW)
                     # 总结后删除该卡片
-                    del self.recent_cards[chat_id]
+                    self.recent_cards.pop(chat_id, None)
+                    self._on_chat_state_changed(chat_id, "card")
                     return False
+                except SchedulerSaturated as e:
+                    logger.warning(f"自动总结文章被更高优先级的请求挤出队列，卡片保留供手动总结: {e}")
+                    return True
                 except Exception as e:
                     logger.error(f"自动处理文章时出错: {e}")
                     logger.exception(e)
@@ -1165,6 +2361,10 @@ class AutoSummaryOpenAI(PluginBase):
         chat_type = "群聊" if is_group else "私聊"
         logger.info(f"收到{chat_type}卡片消息: MsgType={msg_type}, chat_id={chat_id}, sender_id={sender_id}")
 
+        if self._is_duplicate_card(message):
+            logger.info(f"卡片消息已处理过，跳过重复投递: MsgId={message.get('MsgId', '')}")
+            return True
+
         try:
             # 处理XML消息
             card_info = self._process_xml_message(message)
@@ -1179,18 +2379,27 @@ class AutoSummaryOpenAI(PluginBase):
                 "info": card_info,
                 "timestamp": time.time()
             }
+            self._on_chat_state_changed(chat_id, "card")
             logger.info(f"已存储卡片信息: {card_info['title']} 供后续总结使用")
 
             # 检查是否应该自动总结
             # 传入群ID/用户ID和发送者ID
             if self._should_auto_summarize(chat_id, is_group, sender_id):
+                # 请求较多时不自动总结，卡片保留在 recent_cards 中，可稍后手动发送总结命令
+                if self.llm_scheduler.is_saturated(PRIORITY_LOW):
+                    logger.warning(f"openai请求队列已满，跳过自动总结卡片: {card_info['title']}")
+                    return True
                 logger.info(f"自动总结卡片: {card_info['title']}")
                 try:
-                    # 处理卡片消息
-                    await self._handle_card_message(bot, chat_id, card_info)
+                    # 处理卡片消息，自动总结使用低优先级
+                    await self._handle_card_message(bot, chat_id, card_info, priority=PRIORITY_LOW)
                     # 总结后删除该卡片
-                    del self.recent_cards[chat_id]
+                    self.recent_cards.pop(chat_id, None)
+                    self._on_chat_state_changed(chat_id, "card")
                     return False
+                except SchedulerSaturated as e:
+                    logger.warning(f"自动总结卡片被更高优先级的请求挤出队列，卡片保留供手动总结: {e}")
+                    return True
                 except Exception as e:
                     logger.error(f"自动处理卡片时出错: {e}")
                     logger.exception(e)
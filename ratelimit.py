@@ -0,0 +1,116 @@
+import asyncio
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+_CJK_RE = re.compile(r'[\u3000-\u9fff\uac00-\ud7af\uff00-\uffef]')
+
+
+class RetryableError(Exception):
+    """上游返回 429/5xx 或网络错误，可以稍后重试"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, status: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+class TokenBucket:
+    """令牌桶限流器
+
+    rate_per_minute 为每分钟补充的令牌数，小于等于 0 表示不限流。
+    收到上游的 Retry-After 时调用 pause()，所有等待者都会等到暂停结束。
+    等待者按到达顺序获取令牌。
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate_per_minute = rate_per_minute or 0
+        self.capacity = capacity if capacity else max(self.rate_per_minute, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_minute > 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_minute / 60)
+
+    def pause(self, seconds: float):
+        """暂停发放令牌 seconds 秒，并清空已有令牌"""
+        if seconds <= 0:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0
+
+    def charge(self, amount: float):
+        """记入已经发生的消耗（例如实际下载的数据量），令牌可以变为负数，之后的 acquire 需要等待补足"""
+        if not self.enabled:
+            return
+        self._refill(time.monotonic())
+        self._tokens -= amount
+
+    def available(self) -> float:
+        """当前可用的令牌数，暂停期间为0"""
+        now = time.monotonic()
+        if self._paused_until > now:
+            return 0.0
+        self._refill(now)
+        return self._tokens
+
+    async def acquire(self, amount: float = 1, deadline: Optional[float] = None) -> bool:
+        """获取令牌，需要等待时异步等待
+
+        deadline 为 time.monotonic() 的截止时间，无法在截止时间前获取时返回 False。
+        """
+        if not self.enabled and self._paused_until <= time.monotonic():
+            return True
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if not self.enabled or self._tokens >= amount:
+                        if self.enabled:
+                            self._tokens -= amount
+                        return True
+                    wait = (amount - self._tokens) * 60 / self.rate_per_minute
+                if deadline is not None and now + wait > deadline:
+                    return False
+                await asyncio.sleep(wait)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头，支持秒数和 HTTP 日期两种格式"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    """带随机抖动的指数退避（full jitter），attempt 从 0 开始"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本的 token 数：中日韩字符按 1 个计算，其他字符按 4 个 1 token 计算"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
@@ -0,0 +1,60 @@
+import math
+import re
+from collections import Counter
+from typing import List, Tuple
+
+# 连续的中日韩字符，以及英文单词/数字
+_TOKEN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]+|[a-z0-9]+(?:[._-][a-z0-9]+)*')
+_CJK_RUN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+
+
+def tokenize(text: str) -> List[str]:
+    """切分为检索用的词项：中日韩文本按相邻两字切分（不需要分词词典），英文单词和数字整体保留"""
+    tokens = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RUN_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class BM25Index:
+    """文章片段的 BM25 词法索引，完全在本地计算"""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self._term_freqs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = sum(self._lengths) / len(chunks) if chunks else 0.0
+        doc_freq = Counter()
+        for tf in self._term_freqs:
+            doc_freq.update(tf.keys())
+        total = len(chunks)
+        self._idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in doc_freq.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self._idf]
+        result = []
+        for tf, length in zip(self._term_freqs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            result.append(score)
+        return result
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """返回得分最高的 top_k 个片段 (序号, 得分)，不包含得分为 0 的片段"""
+        ranked = sorted(enumerate(self.scores(query)), key=lambda item: item[1], reverse=True)
+        return [(index, score) for index, score in ranked[:top_k] if score > 0]
@@ -0,0 +1,57 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+
+class Route(NamedTuple):
+    """消息分类结果
+
+    kind: "qa" 追问、"summary" 总结、"url" 普通链接消息、"ignore" 其他消息
+    trigger: 匹配到的触发词
+    argument: 追问的问题，或总结命令中的自定义问题（已去掉触发词和URL）
+    urls: 触发词之后（普通消息为整条消息中）出现的URL
+    """
+    kind: str
+    trigger: Optional[str] = None
+    argument: str = ""
+    urls: Tuple[str, ...] = ()
+
+
+class CommandRouter:
+    """在初始化时编译好的命令路由
+
+    所有触发词合并为一个正则分支，追问触发词优先（与原有先判断追问的顺序一致），
+    总结触发词按长度从长到短排列，保证 "/总结一下" 不会被当作 "/总结" + 自定义问题 "一下"。
+    每条消息只做一次触发词匹配和一次URL扫描。
+    """
+
+    def __init__(self, summary_triggers: List[str], qa_trigger: str, url_pattern: str):
+        self.summary_triggers = list(summary_triggers)
+        self.qa_trigger = qa_trigger
+        summary_alternation = "|".join(
+            re.escape(trigger) for trigger in sorted(set(self.summary_triggers), key=len, reverse=True)
+        )
+        self._command_re = re.compile(
+            f"^\\s*(?:(?P<qa>{re.escape(qa_trigger)})|(?P<summary>{summary_alternation}))\\s*(?P<rest>.*)$",
+            re.IGNORECASE | re.DOTALL
+        )
+        self._url_re = re.compile(url_pattern)
+
+    def route(self, content: str) -> Route:
+        match = self._command_re.match(content)
+        if match is None:
+            urls = tuple(self._url_re.findall(content))
+            return Route("url" if urls else "ignore", urls=urls)
+
+        rest = match.group("rest").strip()
+        if match.group("qa") is not None:
+            return Route("qa", trigger=match.group("qa"), argument=rest)
+
+        trigger = match.group("summary")
+        url_matches = list(self._url_re.finditer(rest))
+        if not url_matches:
+            return Route("summary", trigger=trigger, argument=rest)
+
+        # "{触发词} [自定义问题] [URL]"：优先使用URL之前的文字，没有时使用URL之后的文字
+        first = url_matches[0]
+        argument = rest[:first.start()].strip() or rest[first.end():].strip()
+        return Route("summary", trigger=trigger, argument=argument, urls=tuple(m.group(0) for m in url_matches))
@@ -0,0 +1,144 @@
+import asyncio
+import heapq
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+# 优先级，数值越小越优先
+PRIORITY_HIGH = 0  # 用户显式发送的总结命令和追问
+PRIORITY_LOW = 1  # 自动总结
+
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_LOW: "low"}
+
+
+class SchedulerSaturated(Exception):
+    """等待队列已满，请求被拒绝"""
+
+
+class LLMScheduler:
+    """openai 请求调度器
+
+    限制同时进行的请求数，超出的请求按优先级排队（同优先级先进先出）。
+    队列已满时，高优先级请求会挤掉队列中最晚进入的低优先级请求，
+    低优先级请求直接被拒绝，两种情况都抛出 SchedulerSaturated。
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 32):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self._queue: list = []
+        self._seq = 0
+        self._active = 0
+        self._waiting = 0
+
+        # 排队耗时统计，按优先级记录
+        self._wait_total: Dict[int, float] = {}
+        self._wait_count: Dict[int, int] = {}
+        self._wait_max: Dict[int, float] = {}
+        self.last_wait = 0.0
+        self.dropped = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def is_saturated(self, priority: int = PRIORITY_LOW) -> bool:
+        """队列已满且没有可以挤掉的更低优先级请求时返回 True"""
+        if self._active < self.max_concurrency and not self._waiting:
+            return False
+        if self._waiting < self.max_queue:
+            return False
+        return not any(p > priority and not fut.done() for p, _, fut in self._queue)
+
+    def _record_wait(self, priority: int, wait: float):
+        self.last_wait = wait
+        self._wait_total[priority] = self._wait_total.get(priority, 0.0) + wait
+        self._wait_count[priority] = self._wait_count.get(priority, 0) + 1
+        self._wait_max[priority] = max(self._wait_max.get(priority, 0.0), wait)
+
+    def _evict_lower(self, priority: int) -> bool:
+        """挤掉队列中优先级最低、最晚进入的一个请求"""
+        victim = None
+        for item in self._queue:
+            p, seq, fut = item
+            if p > priority and not fut.done():
+                if victim is None or (p, seq) > (victim[0], victim[1]):
+                    victim = item
+        if victim is None:
+            return False
+        victim[2].set_exception(SchedulerSaturated("请求被更高优先级的请求挤出队列"))
+        self._waiting -= 1
+        self.dropped += 1
+        return True
+
+    def _wake(self):
+        while self._active < self.max_concurrency and self._queue:
+            _, _, fut = heapq.heappop(self._queue)
+            if fut.done():
+                # 已取消或被挤出的请求
+                continue
+            self._waiting -= 1
+            self._active += 1
+            fut.set_result(None)
+
+    async def acquire(self, priority: int = PRIORITY_HIGH) -> float:
+        """获取一个执行名额，返回排队等待的秒数"""
+        start = time.monotonic()
+        if self._active < self.max_concurrency and not self._waiting:
+            self._active += 1
+            self._record_wait(priority, 0.0)
+            return 0.0
+
+        if self._waiting >= self.max_queue and not self._evict_lower(priority):
+            self.dropped += 1
+            raise SchedulerSaturated(f"openai请求队列已满: 执行中={self._active}, 排队={self._waiting}")
+
+        fut = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._queue, (priority, self._seq, fut))
+        self._waiting += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.cancelled():
+                # 排队期间被取消
+                self._waiting -= 1
+            elif fut.exception() is None:
+                # 已经分配到名额但调用方被取消，归还名额
+                self.release()
+            raise
+
+        wait = time.monotonic() - start
+        self._record_wait(priority, wait)
+        return wait
+
+    def release(self):
+        self._active -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_HIGH):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        """当前状态和各优先级的排队耗时"""
+        result = {
+            "active": self._active,
+            "waiting": self._waiting,
+            "dropped": self.dropped,
+            "last_wait": self.last_wait,
+        }
+        for priority, name in PRIORITY_NAMES.items():
+            count = self._wait_count.get(priority, 0)
+            result[f"{name}_wait_avg"] = self._wait_total.get(priority, 0.0) / count if count else 0.0
+            result[f"{name}_wait_max"] = self._wait_max.get(priority, 0.0)
+            result[f"{name}_requests"] = count
+        return result
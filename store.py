@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from loguru import logger
+
+
+class PersistentStore:
+    """基于 SQLite (WAL 模式) 的本地持久化存储
+
+    以 (namespace, key) 为主键保存 JSON 数据，每条数据带过期时间。
+    所有数据库操作都在单独的单线程执行器中进行，写入不会阻塞事件循环，
+    并且按提交顺序执行。超过磁盘上限时按最近更新时间淘汰最旧的数据。
+    """
+
+    # 每写入多少次检查一次过期数据和磁盘占用
+    MAINTENANCE_INTERVAL = 200
+
+    def __init__(self, path: str, ttl: float = 1800, max_size_mb: float = 100):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="AutoSummaryStore")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS kv (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv (expires_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_updated ON kv (updated_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _submit(self, fn, *args):
+        """提交写操作但不等待结果，失败时只记录日志"""
+        if self._closed:
+            return
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._log_write_error)
+
+    @staticmethod
+    def _log_write_error(future):
+        error = future.exception()
+        if error:
+            logger.error(f"写入持久化存储失败: {error}")
+
+    def _get_sync(self, namespace: str, key: str) -> Optional[Any]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at FROM kv WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at <= time.time():
+            conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+            conn.commit()
+            return None
+        return json.loads(value)
+
+    def _put_sync(self, namespace: str, key: str, value: str, expires_at: float):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, size, expires_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, value, len(value.encode("utf-8")), expires_at, time.time())
+        )
+        conn.commit()
+        self._writes += 1
+        if self._writes % self.MAINTENANCE_INTERVAL == 0:
+            self._maintain_sync()
+
+    def _delete_sync(self, namespace: str, key: str):
+        conn = self._connect()
+        conn.execute("DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key))
+        conn.commit()
+
+    def _maintain_sync(self):
+        """删除过期数据，并在超过磁盘上限时淘汰最旧的数据"""
+        conn = self._connect()
+        conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM kv").fetchone()[0]
+        if total > self.max_bytes:
+            # 淘汰到上限的90%，避免每次写入都触发
+            target = int(self.max_bytes * 0.9)
+            removed = 0
+            for rowid, size in conn.execute("SELECT rowid, size FROM kv ORDER BY updated_at").fetchall():
+                if total <= target:
+                    break
+                conn.execute("DELETE FROM kv WHERE rowid = ?", (rowid,))
+                total -= size
+                removed += 1
+            logger.info(f"持久化存储超过上限，已淘汰 {removed} 条数据")
+        conn.commit()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        if self._closed:
+            return None
+        try:
+            return await self._run(self._get_sync, namespace, key)
+        except Exception as e:
+            logger.error(f"读取持久化存储失败: {e}")
+            return None
+
+    def put(self, namespace: str, key: str, value: Any, timestamp: Optional[float] = None, ttl: Optional[float] = None):
+        """异步写入一条数据，过期时间从 timestamp（默认当前时间）开始计算"""
+        expires_at = (timestamp if timestamp is not None else time.time()) + (ttl if ttl is not None else self.ttl)
+        self._submit(self._put_sync, namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+
+    def delete(self, namespace: str, key: str):
+        self._submit(self._delete_sync, namespace, key)
+
+    async def maintain(self):
+        if self._closed:
+            return
+        try:
+            await self._run(self._maintain_sync)
+        except Exception as e:
+            logger.error(f"维护持久化存储失败: {e}")
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+
+        def close_sync():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await asyncio.get_running_loop().run_in_executor(self._executor, close_sync)
+        self._executor.shutdown(wait=False)